@@ -175,10 +175,50 @@ SIMPLE_JWT = {
     "SIGNING_KEY": env("SIGNING_KEY", default=SECRET_KEY),
 }
 
+# Seconds a /api/stations/<id>/stats/ result is cached. Entries are keyed on
+# the station's last ingestion, so new readings are never hidden by it.
+STATION_STATS_CACHE_TIMEOUT = env.int("STATION_STATS_CACHE_TIMEOUT", default=3600)
+
+# Raw measurements older than MEASUREMENT_RETENTION_DAYS are moved to
+# Parquet files under MEASUREMENT_ARCHIVE_DIR by
+# `python manage.py archive_measurements`.
+MEASUREMENT_RETENTION_DAYS = env.int("MEASUREMENT_RETENTION_DAYS", default=365)
+MEASUREMENT_ARCHIVE_DIR = env(
+    "MEASUREMENT_ARCHIVE_DIR", default=os.path.join(BASE_DIR, "archive", "measurements")
+)
+
+# HTTP caching of measurement range reads (stations.http_cache). Ranges
+# ending more than MEASUREMENT_INGEST_HORIZON seconds before a station's
+# newest reading rarely change and are cached for
+# MEASUREMENT_HISTORICAL_MAX_AGE seconds; others for MEASUREMENT_LIVE_MAX_AGE.
+# Both then revalidate their ETag, so keep them short.
+MEASUREMENT_INGEST_HORIZON = env.int("MEASUREMENT_INGEST_HORIZON", default=3600)
+MEASUREMENT_HISTORICAL_MAX_AGE = env.int(
+    "MEASUREMENT_HISTORICAL_MAX_AGE", default=10 * 60
+)
+MEASUREMENT_LIVE_MAX_AGE = env.int("MEASUREMENT_LIVE_MAX_AGE", default=60)
+
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# IoT data ingestion
+# "sync" writes uploads to the database inside the request. "queue" only
+# validates them, spools them to INGESTION_SPOOL_DIR and returns 202; run
+# `python manage.py process_ingestion_queue` to write them in batches.
+INGESTION_MODE = env("INGESTION_MODE", default="sync")
+INGESTION_SPOOL_DIR = env(
+    "INGESTION_SPOOL_DIR", default=os.path.join(BASE_DIR, "spool", "ingestion")
+)
+# Largest accepted ingestion body once a gzip/zstd Content-Encoding is undone.
+INGESTION_MAX_BODY_SIZE = env.int("INGESTION_MAX_BODY_SIZE", default=50 * 1024 * 1024)
+# Station IDs known to exist are cached per process so ingestion can skip
+# the station lookup. Set STATION_CACHE_ALIAS to a shared cache (e.g. Redis)
+# to reuse lookups across workers.
+STATION_CACHE_SIZE = env.int("STATION_CACHE_SIZE", default=10000)
+STATION_CACHE_TTL = env.int("STATION_CACHE_TTL", default=300)
+STATION_CACHE_ALIAS = env("STATION_CACHE_ALIAS", default=None)
+
 # Email Configuration for Development
 # This prints emails to the console instead of sending them.
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -1,6 +1,15 @@
 from django.contrib import admin
-from .models import Station, Measurement
+from .models import (
+    Station,
+    Measurement,
+    MeasurementHourly,
+    MeasurementDaily,
+    MeasurementSummary,
+)
 
 # Register your models here.
 admin.site.register(Station)
 admin.site.register(Measurement)
+admin.site.register(MeasurementHourly)
+admin.site.register(MeasurementDaily)
+admin.site.register(MeasurementSummary)
@@ -0,0 +1,264 @@
+import heapq
+import os
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+from urllib.parse import quote
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from .models import Measurement, MeasurementSummary
+from .partitions import add_months, month_start
+
+#
+# Raw readings older than the retention period are moved out of the
+# database into one zstd-compressed Parquet file per station and month:
+#
+#   MEASUREMENT_ARCHIVE_DIR/<station_id>/<YYYY>-<MM>.parquet
+#
+# Rollups and summaries are left untouched, so downsampled queries keep
+# covering archived months, and the CSV export reads the files back.
+#
+
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ("measurement_type", pa.string()),
+        ("value", pa.float64()),
+        ("recorded_at", pa.timestamp("us", tz="UTC")),
+    ]
+)
+
+# Readings deleted per statement once a month has been written to disk.
+DELETE_BATCH_SIZE = 10000
+
+
+def station_archive_dir(station_id):
+    return Path(settings.MEASUREMENT_ARCHIVE_DIR) / quote(station_id, safe="")
+
+
+def archive_path(station_id, month):
+    return station_archive_dir(station_id) / f"{month.year}-{month.month:02d}.parquet"
+
+
+def months_to_archive(cutoff, station_ids=None):
+    """(station_id, month) pairs with raw readings in months ending by `cutoff`."""
+    queryset = Measurement.objects.filter(recorded_at__lt=month_start(cutoff))
+    if station_ids:
+        queryset = queryset.filter(station_id__in=station_ids)
+    return sorted(
+        queryset.order_by()
+        .annotate(month=TruncMonth("recorded_at", tzinfo=timezone.utc))
+        .values_list("station_id", "month")
+        .distinct()
+    )
+
+
+def _read_file(path):
+    return pq.read_table(path, schema=ARCHIVE_SCHEMA)
+
+
+def _write_file(path, table):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    pq.write_table(table, tmp_path, compression="zstd")
+    with open(tmp_path, mode="rb") as file:
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def archive_month(station_id, month, batch_size=DELETE_BATCH_SIZE, delete=True):
+    """
+    Writes the raw readings of one station and month to its Parquet file,
+    merging with a file left by an earlier run, then deletes exactly the
+    archived rows in batches. With delete=False the rows are left in place,
+    e.g. for a caller about to drop the month's partition. Returns the
+    number of readings archived.
+    """
+    queryset = Measurement.objects.filter(
+        station_id=station_id,
+        recorded_at__gte=month,
+        recorded_at__lt=add_months(month, 1),
+    ).order_by()
+    ids, types, values, times = [], [], [], []
+    for pk, m_type, value, recorded_at in queryset.values_list(
+        "id", "measurement_type", "value", "recorded_at"
+    ).iterator(chunk_size=batch_size):
+        ids.append(pk)
+        types.append(m_type)
+        values.append(value)
+        times.append(recorded_at)
+    if not ids:
+        return 0
+
+    table = pa.table([types, values, times], schema=ARCHIVE_SCHEMA)
+    path = archive_path(station_id, month)
+    if path.exists():
+        # Readings that arrived after the month was archived.
+        existing = _read_file(path)
+        known = set(
+            zip(
+                existing["measurement_type"].to_pylist(),
+                existing["recorded_at"].to_pylist(),
+            )
+        )
+        table = pa.concat_tables(
+            [
+                existing,
+                table.filter(
+                    pa.array(
+                        [(t, r) not in known for t, r in zip(types, times)],
+                        pa.bool_(),
+                    )
+                ),
+            ]
+        )
+    _write_file(path, table.sort_by("recorded_at"))
+    if not delete:
+        return len(ids)
+
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        with transaction.atomic():
+            queryset.filter(id__in=ids[start:end]).delete()
+    # Raw reads of the month no longer return these rows.
+    MeasurementSummary.objects.filter(station_id=station_id).update(
+        history_changed_at=datetime.now(timezone.utc)
+    )
+    return len(ids)
+
+
+def archived_months(station_id):
+    """Months with an archive file for the station, oldest first."""
+    months = []
+    for path in station_archive_dir(station_id).glob("*.parquet"):
+        try:
+            year, month = path.stem.split("-")
+            months.append(datetime(int(year), int(month), 1, tzinfo=timezone.utc))
+        except ValueError:
+            continue
+    return sorted(months)
+
+
+def archived_rows(station_id, start, end, types=None):
+    """
+    Yields archived (measurement_type, value, recorded_at) readings of a
+    station within [start, end], newest first, one monthly file at a time.
+    `types` optionally restricts the measurement types.
+    """
+    start, end = _aware(start), _aware(end)
+    for month in reversed(archived_months(station_id)):
+        if not month_start(start) <= month <= end:
+            continue
+        table = _read_file(archive_path(station_id, month))
+        condition = pc.and_(
+            pc.greater_equal(table["recorded_at"], pa.scalar(start)),
+            pc.less_equal(table["recorded_at"], pa.scalar(end)),
+        )
+        if types:
+            condition = pc.and_(
+                condition, pc.is_in(table["measurement_type"], pa.array(types))
+            )
+        table = table.filter(condition).sort_by([("recorded_at", "descending")])
+        yield from zip(
+            table["measurement_type"].to_pylist(),
+            table["value"].to_pylist(),
+            table["recorded_at"].to_pylist(),
+        )
+
+
+def with_archived_rows(station_id, start, end, rows, types=None):
+    """
+    Merges database rows, (measurement_type, value, recorded_at) newest
+    first, with the archived ones of the same range and types.
+    """
+    return heapq.merge(
+        rows,
+        archived_rows(station_id, start, end, types),
+        key=lambda r: r[2],
+        reverse=True,
+    )
+
+
+def with_archived_wide_rows(station_id, start, end, rows, columns):
+    """
+    Merges pivoted database rows, (recorded_at, value_1, ...) newest first,
+    with the archived readings pivoted the same way.
+    """
+    index = {column: i for i, column in enumerate(columns)}
+
+    def pivoted():
+        for recorded_at, readings in groupby(
+            archived_rows(station_id, start, end, columns), key=lambda r: r[2]
+        ):
+            values = [None] * len(columns)
+            for m_type, value, _ in readings:
+                if m_type in index:
+                    values[index[m_type]] = value
+            yield (recorded_at, *values)
+
+    return heapq.merge(rows, pivoted(), key=lambda r: r[0], reverse=True)
+
+
+def archived_hourly(station_id, start, end, exclude=()):
+    """
+    Hourly aggregates of the archived readings of a station within
+    [start, end), as {(measurement_type, hour): (count, min, max, sum)}.
+    Readings whose (measurement_type, recorded_at) is in `exclude`, e.g.
+    late duplicates still in the database, are left out.
+    """
+    start, end = _aware(start), _aware(end)
+    hourly = {}
+    for month in archived_months(station_id):
+        if not month_start(start) <= month < end:
+            continue
+        table = _read_file(archive_path(station_id, month))
+        table = table.filter(
+            pc.and_(
+                pc.greater_equal(table["recorded_at"], pa.scalar(start)),
+                pc.less(table["recorded_at"], pa.scalar(end)),
+            )
+        )
+        if exclude:
+            keys = zip(
+                table["measurement_type"].to_pylist(),
+                table["recorded_at"].to_pylist(),
+            )
+            table = table.filter(pa.array([k not in exclude for k in keys], pa.bool_()))
+        table = table.append_column(
+            "bucket", pc.floor_temporal(table["recorded_at"], unit="hour")
+        )
+        aggregated = table.group_by(["measurement_type", "bucket"]).aggregate(
+            [("value", "count"), ("value", "min"), ("value", "max"), ("value", "sum")]
+        )
+        for row in aggregated.to_pylist():
+            hourly[(row["measurement_type"], row["bucket"])] = (
+                row["value_count"],
+                row["value_min"],
+                row["value_max"],
+                row["value_sum"],
+            )
+    return hourly
+
+
+def archived_bounds(station_id):
+    """
+    First and last archived reading time and the value of the last one, per
+    measurement type: {measurement_type: (first, last, last_value)}.
+    """
+    bounds = {}
+    for m_type, value, recorded_at in archived_rows(
+        station_id, datetime.min, datetime.max
+    ):
+        if m_type in bounds:
+            _, last, last_value = bounds[m_type]
+            bounds[m_type] = (recorded_at, last, last_value)
+        else:
+            bounds[m_type] = (recorded_at, recorded_at, value)
+    return bounds
+
+
+def _aware(dt):
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
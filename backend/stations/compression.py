@@ -0,0 +1,69 @@
+import gzip
+import io
+import zlib
+import zstandard
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, UnsupportedMediaType
+
+# Decompressed bytes read at a time, so the size limit is checked as we go.
+READ_CHUNK_SIZE = 64 * 1024
+
+DECODERS = {
+    "gzip": lambda stream: gzip.GzipFile(fileobj=stream, mode="rb"),
+    "x-gzip": lambda stream: gzip.GzipFile(fileobj=stream, mode="rb"),
+    "zstd": lambda stream: zstandard.ZstdDecompressor().stream_reader(stream),
+}
+DECODE_ERRORS = (OSError, EOFError, zlib.error, zstandard.ZstdError)
+
+
+class RequestBodyTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body is too large once decompressed."
+    default_code = "request_too_large"
+
+
+def decompress(stream, encoding, limit):
+    """
+    Reads a compressed stream into memory, failing as soon as the output
+    grows past `limit` bytes instead of inflating the whole body first.
+    """
+    output = io.BytesIO()
+    try:
+        reader = DECODERS[encoding](stream)
+        while True:
+            chunk = reader.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            if output.tell() + len(chunk) > limit:
+                raise RequestBodyTooLarge()
+            output.write(chunk)
+    except DECODE_ERRORS:
+        raise ParseError(f"Request body is not valid {encoding} data.")
+    return output.getvalue()
+
+
+class DecompressRequestMixin:
+    """
+    Transparently undoes a gzip (or zstd, if `zstandard` is installed)
+    Content-Encoding on the request body before the parsers run.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        encoding = request.META.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if encoding and encoding != "identity":
+            if encoding not in DECODERS:
+                raise UnsupportedMediaType(
+                    request.content_type,
+                    detail=f'Unsupported Content-Encoding "{encoding}".',
+                )
+            body = decompress(request._request, encoding, self.max_body_size())
+            # Swap the body seen by the parsers for the decompressed one.
+            request._request._body = body
+            request._request._stream = io.BytesIO(body)
+            request.META["CONTENT_LENGTH"] = str(len(body))
+            del request.META["HTTP_CONTENT_ENCODING"]
+        super().initial(request, *args, **kwargs)
+
+    def max_body_size(self):
+        return settings.INGESTION_MAX_BODY_SIZE
@@ -0,0 +1,45 @@
+import csv
+
+# Rows fetched per round trip from the server-side cursor.
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_HEADER = ["measurement_type", "value", "recorded_at"]
+
+# Wide exports use the layout of the station CSV files (see
+# data/dados_com_colunas_personalizadas.csv), followed by one column per type.
+WIDE_EXPORT_HEADER = ["Timestamp", "DeviceID"]
+
+
+class Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def format_timestamp(value):
+    # Same format as DRF's DateTimeField, so exports match the JSON API.
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def long_rows(rows):
+    """Formats (measurement_type, value, recorded_at) tuples for export."""
+    for measurement_type, value, recorded_at in rows:
+        yield measurement_type, value, format_timestamp(recorded_at)
+
+
+def wide_rows(station_id, rows):
+    """Formats pivoted (recorded_at, value_1, ...) tuples like the station CSVs."""
+    for recorded_at, *values in rows:
+        yield int(recorded_at.timestamp()), station_id, *values
+
+
+def stream_csv(header, rows):
+    """Yields CSV lines for `header` followed by `rows`, one line at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
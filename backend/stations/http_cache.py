@@ -0,0 +1,95 @@
+import hashlib
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from .models import MeasurementSummary
+
+#
+# HTTP caching of MeasurementViewSet range reads, decided from the station's
+# MeasurementSummary rows alone:
+#
+# - Ranges ending more than MEASUREMENT_INGEST_HORIZON before the station's
+#   newest reading (its watermark) are historical and normally no longer
+#   change. Their ETag is derived from the request and from when readings
+#   before the watermark last changed (late uploads, archival, rebuilds), with
+#   a longer max-age than live ranges. They are not marked immutable, so
+#   clients do revalidate and see such changes.
+# - Other ranges still receive readings. Their ETag also covers when the
+#   station's summaries last changed, with a short max-age.
+#
+# Either way a matching If-None-Match is answered with 304 before the
+# measurement table is queried.
+#
+
+
+def station_watermark(station_id):
+    """
+    Returns (watermark, last change, last change of history) of a station
+    from its summaries, or (None, None, None) if it has no readings. The
+    last is None until readings before the watermark changed.
+    """
+    summary = MeasurementSummary.objects.filter(station_id=station_id).aggregate(
+        last=Max("last_recorded_at"),
+        updated=Max("updated_at"),
+        history=Max("history_changed_at"),
+    )
+    if summary["last"] is None:
+        return None, None, None
+    horizon = timedelta(seconds=settings.MEASUREMENT_INGEST_HORIZON)
+    return summary["last"] - horizon, summary["updated"], summary["history"]
+
+
+def range_etag(request, version=""):
+    """Strong ETag of the requested representation (path, query and format)."""
+    query = sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values
+    )
+    parts = [
+        request.path,
+        repr(query),
+        getattr(request, "accepted_media_type", "") or "",
+        version,
+    ]
+    return quote_etag(hashlib.md5("|".join(parts).encode()).hexdigest())
+
+
+def cache_measurement_range(method):
+    """
+    Decorates a MeasurementViewSet handler with ETag and Cache-Control
+    headers for its station_id/start/end range, returning 304 when the
+    client's copy is current. Requests without a valid range, or for a
+    station without readings, are passed through untouched.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        measurement_range = self.get_range()
+        if measurement_range is None:
+            return method(self, request, *args, **kwargs)
+        station_id, _, end = measurement_range
+        watermark, updated, history = station_watermark(station_id)
+        if watermark is None:
+            return method(self, request, *args, **kwargs)
+
+        historical = end < watermark
+        if historical:
+            etag = range_etag(request, history.isoformat() if history else "")
+            max_age = settings.MEASUREMENT_HISTORICAL_MAX_AGE
+        else:
+            etag = range_etag(request, updated.isoformat())
+            max_age = settings.MEASUREMENT_LIVE_MAX_AGE
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        # Measurements are only served to authenticated users.
+        patch_cache_control(response, private=True, max_age=max_age)
+        return response
+
+    return wrapper
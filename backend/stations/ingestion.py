@@ -0,0 +1,218 @@
+import csv
+import io
+from datetime import datetime, timezone
+from itertools import repeat
+import numpy as np
+from django.db import connection, transaction
+from rest_framework import serializers
+from .models import Measurement
+from .serializers import (
+    MAX_UNIX_TIMESTAMP,
+    MIN_UNIX_TIMESTAMP,
+    MeasurementCreateSerializer,
+)
+from .rollups import refresh_rollups_for
+
+# Number of rows sent per INSERT statement by bulk_create.
+BULK_BATCH_SIZE = 5000
+
+# Readings are COPYed into this session-local table and then moved into
+# stations_measurement with ON CONFLICT DO NOTHING, since COPY itself cannot
+# skip rows that violate the unique constraint.
+CREATE_STAGING_TABLE = """
+CREATE TEMPORARY TABLE IF NOT EXISTS measurement_staging (
+    station_id varchar(100),
+    measurement_type varchar(100),
+    value double precision,
+    recorded_at timestamptz
+) ON COMMIT DELETE ROWS
+"""
+
+COPY_TO_STAGING = """
+COPY measurement_staging (station_id, measurement_type, value, recorded_at)
+FROM STDIN WITH (FORMAT csv)
+"""
+
+MOVE_STAGED_READINGS = """
+INSERT INTO stations_measurement (station_id, measurement_type, value, recorded_at)
+SELECT station_id, measurement_type, value, recorded_at FROM measurement_staging
+ON CONFLICT DO NOTHING
+"""
+
+
+def validate_readings(measurements_data):
+    """
+    Validates a list of raw readings in a single pass.
+    Returns the valid readings as (type, value, unix_timestamp) tuples and a
+    list of errors for the readings that were rejected (keyed by their index
+    in the payload).
+    """
+    validator = MeasurementCreateSerializer()
+    readings = []
+    errors = []
+
+    for index, m_data in enumerate(measurements_data):
+        try:
+            validated = validator.run_validation(m_data)
+        except serializers.ValidationError as e:
+            errors.append({"index": index, "errors": e.detail})
+            continue
+        readings.append(
+            (validated["type"], validated["value"], validated["recorded_at"])
+        )
+
+    return readings, errors
+
+
+def columnar_readings(timestamps, values):
+    """
+    Validates a columnar upload: one array of Unix timestamps plus one array
+    of values per measurement type, aligned with the timestamps. Missing
+    readings are sent as null (JSON) or NaN (packed binary) and skipped.
+    Returns (type, value, unix_timestamp) tuples like validate_readings().
+    Raises ValueError if the arrays are malformed.
+    """
+    try:
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("timestamps must be a list of Unix timestamps.")
+    if timestamps.ndim != 1:
+        raise ValueError("timestamps must be a list of Unix timestamps.")
+    if timestamps.size and (
+        timestamps.min() < MIN_UNIX_TIMESTAMP or timestamps.max() > MAX_UNIX_TIMESTAMP
+    ):
+        raise ValueError("timestamps are outside the supported date range.")
+    if not isinstance(values, dict):
+        raise ValueError("values must map each measurement type to a list.")
+
+    readings = []
+    for m_type, column in values.items():
+        if not m_type or len(m_type) > 100:
+            raise ValueError(f"Invalid measurement type {m_type!r}.")
+        try:
+            column = np.asarray(column, dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"{m_type} must be a list of numbers.")
+        if column.shape != timestamps.shape:
+            raise ValueError(
+                f"{m_type} has {column.size} values for {timestamps.size} timestamps."
+            )
+        missing = np.isnan(column)
+        if not np.isfinite(column[~missing]).all():
+            raise ValueError(f"{m_type} values must be finite numbers.")
+        present = np.flatnonzero(~missing)
+        readings.extend(
+            zip(
+                repeat(m_type),
+                column[present].tolist(),
+                timestamps[present].tolist(),
+            )
+        )
+    return readings
+
+
+def station_readings(station_id, readings):
+    """
+    Turns (type, value, unix_timestamp) tuples into the
+    (station_id, type, value, recorded_at) rows taken by write_readings(),
+    converting each distinct timestamp only once.
+    """
+    datetimes = {}
+    rows = []
+    for m_type, value, unix_timestamp in readings:
+        recorded_at = datetimes.get(unix_timestamp)
+        if recorded_at is None:
+            recorded_at = datetimes[unix_timestamp] = datetime.fromtimestamp(
+                unix_timestamp, tz=timezone.utc
+            )
+        rows.append((station_id, m_type, value, recorded_at))
+    return rows
+
+
+def build_measurements(station_id, measurements_data):
+    """
+    Validates a list of raw readings (see validate_readings()).
+    Returns the unsaved Measurement objects and the validation errors.
+    """
+    readings, errors = validate_readings(measurements_data)
+    measurements = [
+        Measurement(
+            station_id=station_id,
+            measurement_type=m_type,
+            value=value,
+            # Convert Unix timestamp to datetime object
+            recorded_at=datetime.fromtimestamp(unix_timestamp, tz=timezone.utc),
+        )
+        for m_type, value, unix_timestamp in readings
+    ]
+    return measurements, errors
+
+
+def write_measurements(measurements):
+    """
+    Saves the given Measurement objects with a single bulk INSERT
+    inside one transaction. Readings that already exist (same station,
+    type and timestamp) are skipped, so replayed uploads are harmless.
+    The hourly and daily rollups covering the new readings are refreshed
+    in the same transaction. Returns the number of readings submitted.
+    """
+    if not measurements:
+        return 0
+
+    with transaction.atomic():
+        Measurement.objects.bulk_create(
+            measurements, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+        )
+        refresh_rollups_for((m.station_id, m.recorded_at) for m in measurements)
+    return len(measurements)
+
+
+def copy_readings(readings):
+    """
+    Writes (station_id, measurement_type, value, recorded_at) tuples with
+    PostgreSQL COPY FROM STDIN, skipping readings that already exist.
+    Must be called inside a transaction.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (station_id, m_type, value, recorded_at.isoformat())
+        for station_id, m_type, value, recorded_at in readings
+    )
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING_TABLE)
+        cursor.copy_expert(COPY_TO_STAGING, buffer)
+        cursor.execute(MOVE_STAGED_READINGS)
+
+
+def write_readings(readings):
+    """
+    Bulk path for large loads: saves a list of (station_id, measurement_type,
+    value, recorded_at) tuples without building model instances on
+    PostgreSQL (COPY), falling back to bulk_create on other databases.
+    Rollups are refreshed in the same transaction. Returns the number of
+    readings submitted.
+    """
+    if not readings:
+        return 0
+
+    if connection.vendor != "postgresql":
+        return write_measurements(
+            [
+                Measurement(
+                    station_id=station_id,
+                    measurement_type=m_type,
+                    value=value,
+                    recorded_at=recorded_at,
+                )
+                for station_id, m_type, value, recorded_at in readings
+            ]
+        )
+
+    with transaction.atomic():
+        copy_readings(readings)
+        refresh_rollups_for(
+            (station_id, recorded_at) for station_id, _, _, recorded_at in readings
+        )
+    return len(readings)
@@ -0,0 +1,63 @@
+import time
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from stations.archive import (
+    DELETE_BATCH_SIZE,
+    archive_month,
+    archive_path,
+    months_to_archive,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move raw measurements older than the retention period to Parquet "
+        "files, one per station and month"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.MEASUREMENT_RETENTION_DAYS,
+            help=(
+                "Retention period. Whole months ending more than this many days "
+                "ago are archived."
+            ),
+        )
+        parser.add_argument(
+            "--station",
+            action="append",
+            dest="stations",
+            help="Station ID to archive (repeatable). Defaults to all stations.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DELETE_BATCH_SIZE,
+            help="Readings deleted per statement after a month is archived.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=options["days"])
+        started = time.perf_counter()
+        archived = 0
+
+        for station_id, month in months_to_archive(cutoff, options["stations"]):
+            count = archive_month(station_id, month, options["batch_size"])
+            archived += count
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Archived {count} readings of {station_id} to "
+                    f"{archive_path(station_id, month)}."
+                )
+            )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {archived} readings from months before {cutoff:%Y-%m} "
+                f"in {elapsed:.1f}s."
+            )
+        )
@@ -0,0 +1,184 @@
+import time
+from datetime import datetime, timedelta, timezone
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+from stations.models import MEASUREMENT_TYPES
+
+#
+# Benchmarks the MeasurementViewSet range query on a large synthetic table.
+#
+# To run this command, execute the following in your terminal:
+# python manage.py benchmark_measurements --rows 2000000
+#
+# The readings go to a temporary scratch table with the columns and indexes
+# of stations_measurement, inside a transaction that is rolled back at the
+# end. The real table is never written to or locked. The command will:
+# 1. Generate `--rows` readings spread over `--stations` stations and the
+#    last `--days` days with a single INSERT ... SELECT generate_series().
+# 2. Run the year-long range query used by the SensorData page, for all
+#    measurement types and for one (`types=`), with EXPLAIN ANALYZE and time
+#    fetching the rows. The scratch table starts with an extra
+#    (station, type, recorded_at DESC) index on top of the real ones.
+# 3. Drop indexes one at a time and repeat step 2: the extra index (leaving
+#    the real set), the (station, recorded_at DESC) index and the
+#    (station, type, recorded_at) unique index (leaving the station index).
+#
+# Only PostgreSQL is supported.
+#
+
+SCRATCH_TABLE = "bench_measurement"
+
+# stations_measurement without partitioning and foreign key, with the
+# indexes it had before migration 0008 (station, unique reading, time).
+CREATE_SCRATCH_SQL = [
+    f"""
+    CREATE TEMPORARY TABLE {SCRATCH_TABLE} (
+        id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        measurement_type varchar(100) NOT NULL,
+        value double precision NOT NULL,
+        recorded_at timestamp with time zone NOT NULL,
+        station_id varchar(100) NOT NULL
+    ) ON COMMIT DROP
+    """,
+    f"CREATE INDEX bench_station_idx ON {SCRATCH_TABLE} (station_id)",
+    f"CREATE UNIQUE INDEX bench_unique_reading_idx "
+    f"ON {SCRATCH_TABLE} (station_id, measurement_type, recorded_at)",
+    f"CREATE INDEX bench_station_time_idx "
+    f"ON {SCRATCH_TABLE} (station_id, recorded_at DESC)",
+    # Not in stations_measurement: the unique index has the same columns.
+    f"CREATE INDEX bench_type_time_desc_idx "
+    f"ON {SCRATCH_TABLE} (station_id, measurement_type, recorded_at DESC)",
+]
+
+SEED_SQL = f"""
+INSERT INTO {SCRATCH_TABLE} (station_id, measurement_type, value, recorded_at)
+SELECT s.station_id, t.measurement_type, random() * 100, ts
+FROM unnest(%(stations)s::varchar[]) AS s(station_id)
+CROSS JOIN unnest(%(types)s::varchar[]) AS t(measurement_type)
+CROSS JOIN generate_series(%(start)s::timestamptz, %(end)s::timestamptz, %(step)s::interval) AS ts
+"""
+
+
+# The MeasurementViewSet range query, newest first like Measurement.Meta.
+RANGE_SQL = f"""
+SELECT id, recorded_at, value FROM {SCRATCH_TABLE}
+WHERE station_id = %s AND recorded_at >= %s AND recorded_at <= %s
+ORDER BY recorded_at DESC
+"""
+
+# The same query restricted to one measurement type, as with `types=`.
+TYPE_RANGE_SQL = f"""
+SELECT id, recorded_at, value FROM {SCRATCH_TABLE}
+WHERE station_id = %s AND recorded_at >= %s AND recorded_at <= %s
+    AND measurement_type = %s
+ORDER BY recorded_at DESC
+"""
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the measurement range query on a synthetic multi-million-row table"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--rows", type=int, default=2_000_000, help="Approximate rows to generate."
+        )
+        parser.add_argument(
+            "--stations", type=int, default=4, help="Number of synthetic stations."
+        )
+        parser.add_argument(
+            "--days", type=int, default=730, help="Time span covered by the data."
+        )
+        parser.add_argument(
+            "--range-days",
+            type=int,
+            default=365,
+            help="Length of the queried range, ending now.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark requires PostgreSQL.")
+
+        stations = [f"bench-station-{i}" for i in range(options["stations"])]
+        per_series = max(options["rows"] // (len(stations) * len(MEASUREMENT_TYPES)), 1)
+        end = datetime.now(timezone.utc)
+        start = end - timedelta(days=options["days"])
+        step = timedelta(days=options["days"]) / per_series
+
+        try:
+            with transaction.atomic():
+                self.seed(stations, start, end, step)
+
+                params = [
+                    stations[0],
+                    end - timedelta(days=options["range_days"]),
+                    end,
+                ]
+                self.run_query(
+                    "Real indexes and (station, type, recorded_at DESC)", params
+                )
+                self.drop_index("bench_type_time_desc_idx")
+                self.run_query("Real indexes", params)
+                self.drop_index("bench_station_time_idx")
+                self.run_query(
+                    "Station and unique (station, type, recorded_at) indexes", params
+                )
+                self.drop_index("bench_unique_reading_idx")
+                self.run_query("Station index only", params)
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def seed(self, stations, start, end, step):
+        began = time.perf_counter()
+        with connection.cursor() as cursor:
+            for statement in CREATE_SCRATCH_SQL:
+                cursor.execute(statement)
+            cursor.execute(
+                SEED_SQL,
+                {
+                    "stations": stations,
+                    "types": MEASUREMENT_TYPES,
+                    "start": start,
+                    "end": end,
+                    "step": step,
+                },
+            )
+            rows = cursor.rowcount
+            cursor.execute(f"ANALYZE {SCRATCH_TABLE}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {rows} rows in {time.perf_counter() - began:.1f}s."
+            )
+        )
+
+    def drop_index(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX {name}")
+            cursor.execute(f"ANALYZE {SCRATCH_TABLE}")
+
+    def run_query(self, label, params):
+        for types, sql, query_params in [
+            ("all types", RANGE_SQL, params),
+            ("one type", TYPE_RANGE_SQL, [*params, MEASUREMENT_TYPES[0]]),
+        ]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{label}, {types}"))
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", query_params)
+                self.stdout.write("\n".join(row[0] for row in cursor.fetchall()))
+
+                began = time.perf_counter()
+                cursor.execute(sql, query_params)
+                count = len(cursor.fetchall())
+                elapsed = time.perf_counter() - began
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Fetched {count} rows in {elapsed * 1000:.1f} ms.\n"
+                )
+            )
@@ -0,0 +1,108 @@
+import time
+from datetime import datetime, timedelta, timezone
+from django.core.management.base import CommandError, CommandParser
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from stations.models import Measurement, MEASUREMENT_TYPES
+from stations.renderers import MeasurementJSONRenderer, MeasurementRows
+from stations.serializers import MeasurementSerializer
+from .benchmark_measurements import (
+    Command as RangeBenchmarkCommand,
+    Rollback,
+    SCRATCH_TABLE,
+)
+
+#
+# Compares the two ways MeasurementViewSet can render raw readings as JSON.
+#
+# To run this command, execute the following in your terminal:
+# python manage.py benchmark_rendering --rows 100000
+#
+# Like benchmark_measurements, it seeds `--rows` synthetic readings for one
+# station into a temporary scratch table inside a transaction that is rolled
+# back at the end, then times:
+# 1. The serializer path: model instances (read with Measurement.objects.raw),
+#    MeasurementSerializer(many=True) and JSONRenderer.
+# 2. The fast path: row tuples encoded by MeasurementJSONRenderer.
+# Both outputs are checked to be byte-identical.
+#
+# Only PostgreSQL is supported.
+#
+
+
+READINGS_SQL = (
+    f"SELECT {{fields}} FROM {SCRATCH_TABLE} "
+    "WHERE station_id = %s AND recorded_at >= %s ORDER BY recorded_at DESC"
+)
+
+
+class Command(RangeBenchmarkCommand):
+    help = "Benchmark the serializer and fast JSON paths of raw measurement reads"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--rows", type=int, default=100_000, help="Readings to render."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs of each path; the best is kept."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark requires PostgreSQL.")
+
+        stations = ["bench-station-0"]
+        per_series = max(options["rows"] // len(MEASUREMENT_TYPES), 1)
+        end = datetime.now(timezone.utc)
+        step = timedelta(seconds=30)
+        start = end - step * (per_series - 1)
+
+        try:
+            with transaction.atomic():
+                self.seed(stations, start, end, step)
+                fields = MeasurementSerializer.Meta.fields
+                params = [stations[0], start]
+
+                def serializer_path():
+                    readings = Measurement.objects.raw(
+                        READINGS_SQL.format(
+                            fields="id, station_id, " + ", ".join(fields)
+                        ),
+                        params,
+                    )
+                    data = MeasurementSerializer(readings, many=True).data
+                    return JSONRenderer().render(data)
+
+                def fast_path():
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            READINGS_SQL.format(fields=", ".join(fields)), params
+                        )
+                        rows = MeasurementRows(cursor.fetchall(), fields)
+                    return MeasurementJSONRenderer().render(rows)
+
+                expected = self.time(
+                    "Serializer + JSONRenderer", serializer_path, options
+                )
+                content = self.time("Row tuples + orjson", fast_path, options)
+                if content != expected:
+                    raise CommandError("The two paths rendered different bytes.")
+                self.stdout.write(
+                    self.style.SUCCESS(f"Outputs identical ({len(content)} bytes).")
+                )
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
+
+    def time(self, label, render, options):
+        timings = []
+        for _ in range(options["repeat"]):
+            began = time.perf_counter()
+            content = render()
+            timings.append(time.perf_counter() - began)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{label}: best of {len(timings)} {min(timings) * 1000:.1f} ms."
+            )
+        )
+        return content
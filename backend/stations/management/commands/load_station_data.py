@@ -1,14 +1,168 @@
 import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
-from django.core.management.base import BaseCommand, CommandParser
-from stations.models import Station, Measurement
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connections
+from stations.models import Station, MEASUREMENT_TYPES
+from stations.ingestion import write_readings
+
+# Readings buffered before each COPY (or bulk_create on non-PostgreSQL databases).
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def cell(row, index):
+    """Returns the value of a column, or "" if the column or cell is missing."""
+    if index is None or index >= len(row):
+        return ""
+    return row[index]
+
+
+def find_csv_files(source):
+    """Expands a CSV file, a directory of CSV files or a glob pattern."""
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, "*.csv"))
+    elif glob.has_magic(source):
+        paths = glob.glob(source)
+    else:
+        paths = [source]
+    return sorted(paths)
+
+
+def load_file(csv_file_path, chunk_size, log):
+    """
+    Streams the CSV, unpivots the sensor columns into
+    (station_id, measurement_type, value, recorded_at) readings and writes
+    them in chunks. `log(level, message)` receives progress and warnings,
+    with level "success" or "warning". Returns the number of readings written.
+    """
+    # data_example.csv'deki sütun adları.
+    measurement_columns = MEASUREMENT_TYPES
+
+    readings = []
+    known_stations = set()
+    loaded = 0
+
+    with open(csv_file_path, mode="r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        station_index = header.index("DeviceID") if "DeviceID" in header else None
+        timestamp_index = header.index("Timestamp") if "Timestamp" in header else None
+        # Only the sensor columns present in this file are unpivoted.
+        columns = [
+            (header.index(col_name), col_name)
+            for col_name in measurement_columns
+            if col_name in header
+        ]
+
+        for i, row in enumerate(reader):
+            station_id = cell(row, station_index)
+            if not station_id:
+                log("warning", f"Skipping row {i + 1}: Missing DeviceID")
+                continue
+
+            if station_id not in known_stations:
+                _, created = Station.objects.get_or_create(
+                    station_id=station_id,
+                    defaults={"name": f"Station {station_id}"},
+                )
+                known_stations.add(station_id)
+                if created:
+                    log("success", f"Station {station_id} created.")
+
+            timestamp_str = cell(row, timestamp_index)
+            try:
+                # Unix timestamp'i datetime nesnesine çevir.
+                unix_timestamp = int(timestamp_str)
+                aware_dt = datetime.fromtimestamp(unix_timestamp, tz=timezone.utc)
+            except (ValueError, TypeError):
+                log(
+                    "warning",
+                    f"Skipping row {i + 1}: Invalid timestamp format for "
+                    f'value "{timestamp_str}"',
+                )
+                continue
+
+            for index, col_name in columns:
+                value_str = cell(row, index)
+                if value_str == "":
+                    continue
+                try:
+                    readings.append((station_id, col_name, float(value_str), aware_dt))
+                except ValueError:
+                    log(
+                        "warning",
+                        f"Skipping measurement {col_name} in row {i + 1}: "
+                        f'Invalid value "{value_str}"',
+                    )
+
+            if len(readings) >= chunk_size:
+                # Existing readings are skipped, so re-running the
+                # command on the same CSV does not duplicate rows.
+                loaded += write_readings(readings)
+                log("success", f"Bulk created {len(readings)} measurements.")
+                readings = []
+
+        if readings:
+            loaded += write_readings(readings)
+            log("success", f"Bulk created remaining {len(readings)} measurements.")
+
+    return loaded
+
+
+def init_worker():
+    # Worker processes must not share the parent's database connections.
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def load_file_in_worker(csv_file_path, chunk_size):
+    """Runs load_file() in a pool process and returns its log with the result."""
+    messages = []
+    started = time.perf_counter()
+    try:
+        loaded = load_file(
+            csv_file_path, chunk_size, lambda *message: messages.append(message)
+        )
+    finally:
+        connections.close_all()
+    return loaded, time.perf_counter() - started, messages
 
 
 class Command(BaseCommand):
-    help = "Load station data from a CSV file into the database"
+    help = "Load station data from CSV files into the database"
 
     def add_arguments(self, parser: CommandParser) -> None:
-        parser.add_argument("csv_file_path", type=str, help="The path to the CSV file.")
+        parser.add_argument(
+            "csv_file_path",
+            type=str,
+            help="The path to a CSV file, a directory of CSV files or a glob pattern.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of readings written per COPY/bulk insert.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of files loaded concurrently, each in its own process.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help=(
+                "File recording completed CSV paths. Files listed in it are "
+                "skipped, so an interrupted import resumes where it stopped."
+            ),
+        )
 
     def handle(self, *args, **options):
         csv_file_path = options["csv_file_path"]
@@ -16,101 +170,89 @@ class Command(BaseCommand):
             self.style.SUCCESS(f"Starting to load data from {csv_file_path}")
         )
 
-        # data_example.csv'deki sütun adları.
-        measurement_columns = [
-            "max_wind_speed",
-            "mean_wind_speed",
-            "pluviometer",
-            "atmospheric",
-            "temperature",
-            "humidity",
-            "wind_direction",
-            "humidity_solo",
-        ]
+        paths = find_csv_files(csv_file_path)
+        if not paths:
+            raise CommandError(f"No CSV files found for {csv_file_path}")
+
+        checkpoint = options["checkpoint"]
+        completed = self.read_checkpoint(checkpoint)
+        pending = [path for path in paths if os.path.abspath(path) not in completed]
+        if len(pending) < len(paths):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Skipping {len(paths) - len(pending)} file(s) already "
+                    f"completed according to {checkpoint}."
+                )
+            )
 
-        measurements_to_create = []
-        stations_cache = {}
+        self.total_files = len(pending)
+        self.done_files = 0
+        started = time.perf_counter()
+        loaded = 0
 
         try:
-            with open(csv_file_path, mode="r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                for i, row in enumerate(reader):
-                    station_id = row.get("DeviceID")
-                    if not station_id:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Skipping row {i + 1}: Missing DeviceID"
-                            )
-                        )
-                        continue
-
-                    if station_id not in stations_cache:
-                        station, created = Station.objects.get_or_create(
-                            station_id=station_id,
-                            defaults={"name": f"Station {station_id}"},
-                        )
-                        stations_cache[station_id] = station
-                        if created:
-                            self.stdout.write(
-                                self.style.SUCCESS(f"Station {station_id} created.")
-                            )
-
-                    station = stations_cache[station_id]
-
-                    try:
-                        # Unix timestamp'i datetime nesnesine çevir.
-                        unix_timestamp = int(row["Timestamp"])
-                        aware_dt = datetime.fromtimestamp(
-                            unix_timestamp, tz=timezone.utc
-                        )
-                    except (ValueError, TypeError):
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Skipping row {i + 1}: Invalid timestamp format for value "{row.get("Timestamp")}"'
-                            )
-                        )
-                        continue
-
-                    for col_name in measurement_columns:
-                        value_str = row.get(col_name)
-                        if value_str is not None and value_str != "":
-                            try:
-                                value = float(value_str)
-                                measurements_to_create.append(
-                                    Measurement(
-                                        station=station,
-                                        measurement_type=col_name,
-                                        value=value,
-                                        recorded_at=aware_dt,
-                                    )
-                                )
-                            except (ValueError, TypeError):
-                                self.stdout.write(
-                                    self.style.WARNING(
-                                        f'Skipping measurement {col_name} in row {i + 1}: Invalid value "{value_str}"'
-                                    )
-                                )
-
-                    if len(measurements_to_create) > 1000:
-                        Measurement.objects.bulk_create(measurements_to_create)
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f"Bulk created {len(measurements_to_create)} measurements."
-                            )
-                        )
-                        measurements_to_create = []
-
-                if measurements_to_create:
-                    Measurement.objects.bulk_create(measurements_to_create)
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Bulk created remaining {len(measurements_to_create)} measurements."
-                        )
+            if options["workers"] > 1 and len(pending) > 1:
+                loaded = self.load_parallel(pending, options, checkpoint)
+            else:
+                for path in pending:
+                    file_started = time.perf_counter()
+                    count = load_file(path, options["chunk_size"], self.log)
+                    self.file_done(
+                        path, count, time.perf_counter() - file_started, checkpoint
                     )
+                    loaded += count
 
-            self.stdout.write(self.style.SUCCESS("Successfully loaded all data."))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully loaded all data: {loaded} measurements in "
+                    f"{elapsed:.1f}s ({loaded / max(elapsed, 1e-9):.0f} rows/sec)."
+                )
+            )
 
-        except FileNotFoundError:
-            self.stderr.write(self.style.ERROR(f"File not found: {csv_file_path}"))
+        except FileNotFoundError as e:
+            self.stderr.write(self.style.ERROR(f"File not found: {e.filename}"))
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"An unexpected error occurred: {e}"))
+
+    def load_parallel(self, paths, options, checkpoint):
+        # Close our connections so forked workers do not inherit them.
+        connections.close_all()
+        loaded = 0
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], initializer=init_worker
+        ) as executor:
+            futures = {
+                executor.submit(load_file_in_worker, path, options["chunk_size"]): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                count, elapsed, messages = future.result()
+                for level, message in messages:
+                    self.log(level, message)
+                self.file_done(futures[future], count, elapsed, checkpoint)
+                loaded += count
+        return loaded
+
+    def log(self, level, message):
+        style = self.style.WARNING if level == "warning" else self.style.SUCCESS
+        self.stdout.write(style(message))
+
+    def file_done(self, path, count, elapsed, checkpoint):
+        self.done_files += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"[{self.done_files}/{self.total_files}] {path}: {count} "
+                f"measurements in {elapsed:.1f}s "
+                f"({count / max(elapsed, 1e-9):.0f} rows/sec)."
+            )
+        )
+        if checkpoint:
+            with open(checkpoint, mode="a", encoding="utf-8") as file:
+                file.write(os.path.abspath(path) + "\n")
+
+    def read_checkpoint(self, checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return set()
+        with open(checkpoint, mode="r", encoding="utf-8") as file:
+            return {line.strip() for line in file if line.strip()}
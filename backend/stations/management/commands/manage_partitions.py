@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from stations.archive import archive_month
+from stations.models import Measurement
+from stations.partitions import (
+    add_months,
+    create_partition,
+    detach_partition,
+    is_partitioned,
+    month_start,
+    monthly_partitions,
+    months_in_default_partition,
+    partition_name,
+)
+from stations.rollups import mark_history_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly partitions of the measurements table and "
+        "detach or drop the expired ones"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Create partitions from the current month up to this many months ahead.",
+        )
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Also create partitions for months with readings in the default partition.",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            help=(
+                "Detach partitions of months that ended more than this many "
+                "months before the current one."
+            ),
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help=(
+                "Archive the readings of expired partitions to Parquet, then drop "
+                "them instead of keeping them as standalone tables."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError(
+                "The measurements table is not partitioned (PostgreSQL only)."
+            )
+
+        current = month_start(datetime.now(timezone.utc))
+        months = [add_months(current, i) for i in range(options["months_ahead"] + 1)]
+        if options["backfill"]:
+            months += months_in_default_partition()
+
+        for month in sorted(set(months)):
+            if create_partition(month):
+                self.stdout.write(
+                    self.style.SUCCESS(f"Created partition {partition_name(month)}.")
+                )
+
+        retention = options["retention_months"]
+        if retention is None:
+            return
+        cutoff = add_months(current, -retention)
+        for month in sorted(monthly_partitions()):
+            if add_months(month, 1) > cutoff:
+                continue
+            stations = []
+            if options["drop"]:
+                # Keeps the readings readable by the export and rollup rebuilds.
+                # DROP TABLE then removes them instead of row by row deletes.
+                stations = list(self.stations_in(month))
+                archived = sum(
+                    archive_month(station_id, month, delete=False)
+                    for station_id in stations
+                )
+                self.stdout.write(f"Archived {archived} readings of {month:%Y-%m}.")
+            detach_partition(month, drop=options["drop"])
+            for station_id in stations:
+                mark_history_changed(station_id)
+            action = "Dropped" if options["drop"] else "Detached"
+            self.stdout.write(
+                self.style.WARNING(f"{action} partition {partition_name(month)}.")
+            )
+
+    def stations_in(self, month):
+        return (
+            Measurement.objects.filter(
+                recorded_at__gte=month, recorded_at__lt=add_months(month, 1)
+            )
+            .order_by()
+            .values_list("station_id", flat=True)
+            .distinct()
+        )
@@ -0,0 +1,75 @@
+import time
+from django.core.management.base import BaseCommand, CommandParser
+from stations.queue import (
+    claim,
+    process_batch,
+    queue_stats,
+    record_worker_stats,
+    release_stale_claims,
+)
+
+#
+# Drains the ingestion spool filled by /api/iot-data/ when INGESTION_MODE is
+# "queue" (see stations/queue.py).
+#
+# To run this command, execute the following in your terminal:
+# python manage.py process_ingestion_queue
+#
+# Each batch claims up to `--batch-size` uploads and writes all their readings
+# in one transaction. An upload that cannot be written is renamed to
+# <name>.failed without holding back the rest of its batch. Several workers
+# can run side by side.
+#
+
+
+class Command(BaseCommand):
+    help = "Write queued IoT uploads to the database in batched transactions"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Maximum number of queued uploads written per transaction.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        released = release_stale_claims()
+        if released:
+            self.stdout.write(
+                self.style.WARNING(f"Released {released} stale claimed upload(s).")
+            )
+
+        while True:
+            paths = claim(options["batch_size"])
+            if not paths:
+                if options["once"]:
+                    break
+                # Pick up uploads left claimed by workers that died since.
+                release_stale_claims()
+                time.sleep(options["poll_interval"])
+                continue
+
+            started = time.perf_counter()
+            readings = process_batch(paths)
+            elapsed = time.perf_counter() - started
+            record_worker_stats(len(paths), readings, elapsed)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {readings} readings from {len(paths)} upload(s) in "
+                    f"{elapsed:.2f}s ({readings / max(elapsed, 1e-9):.0f} rows/sec), "
+                    f"{queue_stats()['pending_batches']} pending."
+                )
+            )
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.db.models import Max, Min
+from stations.models import Measurement, MeasurementHourly, Station
+from stations.rollups import rebuild_rollups, rebuild_summary
+
+# Rollups are rebuilt one window at a time to keep each transaction short.
+WINDOW = timedelta(days=30)
+
+
+def parse_datetime(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hourly and daily measurement rollups for a time range, "
+        "and the stations' measurement summaries"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--station",
+            action="append",
+            dest="stations",
+            help="Station ID to rebuild (repeatable). Defaults to all stations.",
+        )
+        parser.add_argument(
+            "--start",
+            type=parse_datetime,
+            help="ISO start of the range. Defaults to the oldest reading or rollup.",
+        )
+        parser.add_argument(
+            "--end",
+            type=parse_datetime,
+            help="ISO end of the range. Defaults to the newest reading or rollup.",
+        )
+
+    def handle(self, *args, **options):
+        station_ids = options["stations"] or list(
+            Station.objects.values_list("station_id", flat=True)
+        )
+
+        for station_id in station_ids:
+            start = options["start"] or self.earliest(station_id)
+            end = options["end"] or self.latest(station_id)
+            if start is None or end is None:
+                self.stdout.write(
+                    self.style.WARNING(f"Skipping {station_id}: no data in range.")
+                )
+                continue
+            if start.tzinfo is None or end.tzinfo is None:
+                raise CommandError("--start and --end must include a UTC offset.")
+
+            window_start = start
+            while window_start <= end:
+                window_end = min(window_start + WINDOW, end)
+                with transaction.atomic():
+                    rebuild_rollups(station_id, window_start, window_end)
+                window_start = window_end + timedelta(microseconds=1)
+            # Readings may have been deleted, so the summary is recomputed.
+            rebuild_summary(station_id)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt rollups for {station_id} from {start} to {end}."
+                )
+            )
+
+    def earliest(self, station_id):
+        # Stale rollups with no raw readings left must be covered as well.
+        dates = [
+            Measurement.objects.filter(station_id=station_id).aggregate(
+                date=Min("recorded_at")
+            )["date"],
+            MeasurementHourly.objects.filter(station_id=station_id).aggregate(
+                date=Min("bucket")
+            )["date"],
+        ]
+        dates = [d for d in dates if d is not None]
+        return min(dates) if dates else None
+
+    def latest(self, station_id):
+        dates = [
+            Measurement.objects.filter(station_id=station_id).aggregate(
+                date=Max("recorded_at")
+            )["date"],
+            MeasurementHourly.objects.filter(station_id=station_id).aggregate(
+                date=Max("bucket")
+            )["date"],
+        ]
+        dates = [d for d in dates if d is not None]
+        return max(dates) if dates else None
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:13
+
+from django.db import migrations, models
+
+# Retried uploads may already have produced duplicate readings. Keep the
+# oldest row of every (station, type, timestamp) group so the unique
+# constraint below can be created.
+DELETE_DUPLICATE_MEASUREMENTS = """
+DELETE FROM stations_measurement
+WHERE id NOT IN (
+    SELECT MIN(id)
+    FROM stations_measurement
+    GROUP BY station_id, measurement_type, recorded_at
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0002_alter_station_location"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATE_MEASUREMENTS, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="measurement",
+            constraint=models.UniqueConstraint(
+                fields=("station", "measurement_type", "recorded_at"),
+                name="unique_station_measurement_reading",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0003_measurement_unique_reading"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="measurement",
+            index=models.Index(
+                fields=["station", "-recorded_at"], name="measurement_station_time_idx"
+            ),
+        ),
+    ]
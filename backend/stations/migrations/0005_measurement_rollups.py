@@ -0,0 +1,180 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+# Fill the rollups from the readings already stored, hourly from the raw
+# readings and daily from the hourly rows, as stations.rollups does.
+BACKFILL_HOURLY = """
+INSERT INTO stations_measurementhourly (station_id, measurement_type, bucket,
+    reading_count, min_value, max_value, sum_value, avg_value)
+SELECT station_id, measurement_type, date_trunc('hour', recorded_at),
+    COUNT(*), MIN(value), MAX(value), SUM(value), AVG(value)
+FROM stations_measurement
+GROUP BY 1, 2, 3
+"""
+
+BACKFILL_DAILY = """
+INSERT INTO stations_measurementdaily (station_id, measurement_type, bucket,
+    reading_count, min_value, max_value, sum_value, avg_value)
+SELECT station_id, measurement_type, date_trunc('day', bucket),
+    SUM(reading_count), MIN(min_value), MAX(max_value), SUM(sum_value),
+    SUM(sum_value) / SUM(reading_count)
+FROM stations_measurementhourly
+GROUP BY 1, 2, 3
+"""
+
+
+def backfill_rollups(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(BACKFILL_HOURLY)
+            cursor.execute(BACKFILL_DAILY)
+        return
+
+    Measurement = apps.get_model("stations", "Measurement")
+    MeasurementHourly = apps.get_model("stations", "MeasurementHourly")
+    MeasurementDaily = apps.get_model("stations", "MeasurementDaily")
+    for model, queryset, trunc, count, low, high, total in [
+        (
+            MeasurementHourly,
+            Measurement.objects.all(),
+            TruncHour("recorded_at"),
+            Count("id"),
+            Min("value"),
+            Max("value"),
+            Sum("value"),
+        ),
+        (
+            MeasurementDaily,
+            MeasurementHourly.objects.all(),
+            TruncDay("bucket"),
+            Sum("reading_count"),
+            Min("min_value"),
+            Max("max_value"),
+            Sum("sum_value"),
+        ),
+    ]:
+        rows = (
+            queryset.order_by()
+            .annotate(period=trunc)
+            .values("station_id", "measurement_type", "period")
+            .annotate(n=count, low=low, high=high, total=total)
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    station_id=row["station_id"],
+                    measurement_type=row["measurement_type"],
+                    bucket=row["period"],
+                    reading_count=row["n"],
+                    min_value=row["low"],
+                    max_value=row["high"],
+                    sum_value=row["total"],
+                    avg_value=row["total"] / row["n"],
+                )
+                for row in rows
+            ],
+            batch_size=5000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0004_measurement_station_time_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MeasurementDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("measurement_type", models.CharField(max_length=100)),
+                (
+                    "bucket",
+                    models.DateTimeField(
+                        help_text="Start of the aggregated time bucket"
+                    ),
+                ),
+                ("reading_count", models.PositiveIntegerField()),
+                ("min_value", models.FloatField()),
+                ("max_value", models.FloatField()),
+                ("sum_value", models.FloatField()),
+                ("avg_value", models.FloatField()),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="stations.station",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-bucket"],
+                "abstract": False,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("station", "measurement_type", "bucket"),
+                        name="unique_station_measurement_day",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="MeasurementHourly",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("measurement_type", models.CharField(max_length=100)),
+                (
+                    "bucket",
+                    models.DateTimeField(
+                        help_text="Start of the aggregated time bucket"
+                    ),
+                ),
+                ("reading_count", models.PositiveIntegerField()),
+                ("min_value", models.FloatField()),
+                ("max_value", models.FloatField()),
+                ("sum_value", models.FloatField()),
+                ("avg_value", models.FloatField()),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="stations.station",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-bucket"],
+                "abstract": False,
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("station", "measurement_type", "bucket"),
+                        name="unique_station_measurement_hour",
+                    )
+                ],
+            },
+        ),
+        # Long ranges are read from the rollups only, so they must cover the
+        # existing readings from the start.
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
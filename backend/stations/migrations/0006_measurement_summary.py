@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Seed the summaries from the readings already stored.
+BACKFILL_SUMMARIES = """
+INSERT INTO stations_measurementsummary (station_id, measurement_type,
+    first_recorded_at, last_recorded_at, reading_count, updated_at)
+SELECT station_id, measurement_type, MIN(recorded_at), MAX(recorded_at),
+    COUNT(*), CURRENT_TIMESTAMP
+FROM stations_measurement
+GROUP BY station_id, measurement_type;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0005_measurement_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MeasurementSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("measurement_type", models.CharField(max_length=100)),
+                ("first_recorded_at", models.DateTimeField()),
+                ("last_recorded_at", models.DateTimeField()),
+                ("reading_count", models.PositiveBigIntegerField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="summaries",
+                        to="stations.station",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("station", "measurement_type"),
+                        name="unique_station_measurement_summary",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SUMMARIES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 00:35
+
+from django.db import migrations, models
+
+BACKFILL_LAST_VALUES = """
+UPDATE stations_measurementsummary
+SET last_value = (
+    SELECT m.value FROM stations_measurement m
+    WHERE m.station_id = stations_measurementsummary.station_id
+        AND m.measurement_type = stations_measurementsummary.measurement_type
+        AND m.recorded_at = stations_measurementsummary.last_recorded_at
+);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0006_measurement_summary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="measurementsummary",
+            name="last_value",
+            field=models.FloatField(
+                help_text="Value of the reading at last_recorded_at", null=True
+            ),
+        ),
+        migrations.RunSQL(BACKFILL_LAST_VALUES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from django.db import migrations
+
+# Rebuilds stations_measurement as a table range partitioned by month on
+# recorded_at (PostgreSQL only). A partitioned table's primary key must
+# include the partition key, so it becomes (id, recorded_at); ids still come
+# from a single sequence and stay unique. The existing rows are copied into
+# the new table, so this migration takes a while on large databases.
+
+PREPARE_OLD_TABLE = [
+    "ALTER TABLE stations_measurement RENAME TO stations_measurement_unpartitioned",
+    "ALTER TABLE stations_measurement_unpartitioned "
+    "DROP CONSTRAINT unique_station_measurement_reading",
+    "ALTER TABLE stations_measurement_unpartitioned "
+    "DROP CONSTRAINT stations_measurement_pkey",
+    "DROP INDEX measurement_station_time_idx",
+    "ALTER TABLE stations_measurement_unpartitioned ALTER COLUMN id DROP IDENTITY",
+]
+
+CREATE_PARTITIONED_TABLE = [
+    "CREATE SEQUENCE stations_measurement_id_seq",
+    """
+    CREATE TABLE stations_measurement (
+        id bigint NOT NULL DEFAULT nextval('stations_measurement_id_seq'),
+        measurement_type varchar(100) NOT NULL,
+        value double precision NOT NULL,
+        recorded_at timestamp with time zone NOT NULL,
+        station_id varchar(100) NOT NULL
+            REFERENCES stations_station (station_id) DEFERRABLE INITIALLY DEFERRED,
+        CONSTRAINT stations_measurement_pkey PRIMARY KEY (id, recorded_at),
+        CONSTRAINT unique_station_measurement_reading
+            UNIQUE (station_id, measurement_type, recorded_at)
+    ) PARTITION BY RANGE (recorded_at)
+    """,
+    "ALTER SEQUENCE stations_measurement_id_seq OWNED BY stations_measurement.id",
+    "CREATE INDEX measurement_station_time_idx "
+    "ON stations_measurement (station_id, recorded_at DESC)",
+    "CREATE TABLE stations_measurement_default "
+    "PARTITION OF stations_measurement DEFAULT",
+]
+
+CREATE_MONTH = """
+CREATE TABLE stations_measurement_y{year}m{month:02d}
+PARTITION OF stations_measurement FOR VALUES FROM (%s) TO (%s)
+"""
+
+COPY_ROWS = [
+    """
+    INSERT INTO stations_measurement
+        (id, measurement_type, value, recorded_at, station_id)
+    SELECT id, measurement_type, value, recorded_at, station_id
+    FROM stations_measurement_unpartitioned
+    """,
+    "SELECT setval('stations_measurement_id_seq', "
+    "COALESCE((SELECT MAX(id) FROM stations_measurement), 0) + 1, false)",
+    "DROP TABLE stations_measurement_unpartitioned",
+]
+
+# Months created up front past the current one; manage_partitions keeps
+# creating them afterwards.
+MONTHS_AHEAD = 3
+
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_measurements(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for statement in PREPARE_OLD_TABLE + CREATE_PARTITIONED_TABLE:
+            cursor.execute(statement)
+
+        # One partition per month that has readings, plus the months from
+        # now to MONTHS_AHEAD.
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', recorded_at AT TIME ZONE 'UTC') "
+            "FROM stations_measurement_unpartitioned"
+        )
+        months = {row[0].replace(tzinfo=timezone.utc) for row in cursor.fetchall()}
+        now = datetime.now(timezone.utc)
+        month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+        for _ in range(MONTHS_AHEAD + 1):
+            months.add(month)
+            month = next_month(month)
+
+        for month in sorted(months):
+            cursor.execute(
+                CREATE_MONTH.format(year=month.year, month=month.month),
+                [month, next_month(month)],
+            )
+
+        for statement in COPY_ROWS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0007_measurementsummary_last_value"),
+    ]
+
+    operations = [
+        # Reversing leaves the table partitioned, which the model works with.
+        migrations.RunPython(partition_measurements, migrations.RunPython.noop),
+    ]
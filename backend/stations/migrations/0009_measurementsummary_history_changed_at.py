@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stations", "0008_partition_measurements"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="measurementsummary",
+            name="history_changed_at",
+            field=models.DateTimeField(
+                help_text="When readings before the station's ingest horizon last changed",
+                null=True,
+            ),
+        ),
+    ]
@@ -2,6 +2,19 @@ from django.db import models
 
 # Create your models here.
 
+# Sensor columns reported by the stations, in the order used by the CSV exports
+# (see data/dados_com_colunas_personalizadas.csv).
+MEASUREMENT_TYPES = [
+    "max_wind_speed",
+    "mean_wind_speed",
+    "pluviometer",
+    "atmospheric",
+    "temperature",
+    "humidity",
+    "wind_direction",
+    "humidity_solo",
+]
+
 
 class Station(models.Model):
     # station_id is the unique identifier from the IoT device.
@@ -29,3 +42,98 @@ class Measurement(models.Model):
 
     class Meta:
         ordering = ["-recorded_at"]
+        constraints = [
+            # A station reports each sensor at most once per timestamp, so
+            # retried uploads can be ignored instead of duplicated. Its index
+            # also serves single-type range scans in either order, so there
+            # is no separate (station, type, -recorded_at) index; see
+            # benchmark_measurements.
+            models.UniqueConstraint(
+                fields=["station", "measurement_type", "recorded_at"],
+                name="unique_station_measurement_reading",
+            )
+        ]
+        indexes = [
+            # Serves the station + recorded_at range scans of
+            # MeasurementViewSet in the default (newest first) order.
+            models.Index(
+                fields=["station", "-recorded_at"],
+                name="measurement_station_time_idx",
+            )
+        ]
+
+
+class MeasurementRollup(models.Model):
+    """
+    Pre-aggregated readings of one station and measurement type over a fixed
+    time bucket. Kept up to date by stations.rollups as new readings arrive.
+    """
+
+    station = models.ForeignKey(Station, on_delete=models.CASCADE)
+    measurement_type = models.CharField(max_length=100)
+    bucket = models.DateTimeField(help_text="Start of the aggregated time bucket")
+    reading_count = models.PositiveIntegerField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    sum_value = models.FloatField()
+    avg_value = models.FloatField()
+
+    class Meta:
+        abstract = True
+        ordering = ["-bucket"]
+
+
+class MeasurementHourly(MeasurementRollup):
+    class Meta(MeasurementRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["station", "measurement_type", "bucket"],
+                name="unique_station_measurement_hour",
+            )
+        ]
+
+
+class MeasurementDaily(MeasurementRollup):
+    class Meta(MeasurementRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(
+                fields=["station", "measurement_type", "bucket"],
+                name="unique_station_measurement_day",
+            )
+        ]
+
+
+class MeasurementSummary(models.Model):
+    """
+    First and last reading time, latest value and reading count of one
+    station and measurement type, maintained by stations.rollups so the
+    availability and latest-conditions endpoints do not have to scan the
+    measurements.
+    """
+
+    station = models.ForeignKey(
+        Station, on_delete=models.CASCADE, related_name="summaries"
+    )
+    measurement_type = models.CharField(max_length=100)
+    first_recorded_at = models.DateTimeField()
+    last_recorded_at = models.DateTimeField()
+    last_value = models.FloatField(
+        null=True, help_text="Value of the reading at last_recorded_at"
+    )
+    reading_count = models.PositiveBigIntegerField()
+    updated_at = models.DateTimeField()
+    history_changed_at = models.DateTimeField(
+        null=True,
+        help_text="When readings before the station's ingest horizon last changed",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["station", "measurement_type"],
+                name="unique_station_measurement_summary",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.station.name} - {self.measurement_type}"
@@ -0,0 +1,52 @@
+import json
+import struct
+import numpy as np
+
+#
+# Packed binary upload format for /api/iot-data/ (little-endian):
+#
+#   b"MVR1"                 magic
+#   uint32                  header length in bytes
+#   header                  UTF-8 JSON object: station_id, location, count,
+#                           types (list of measurement types) and dtype
+#                           ("float32" or "float64", default "float64").
+#                           Space padded so the buffers start 8-byte aligned.
+#   int64[count]            Unix timestamps
+#   dtype[count] per type   values in the order of `types`, NaN when a
+#                           sensor has no reading at that timestamp
+#
+# This module only depends on numpy, so upload clients such as
+# script/send_iot_data.py can import it without Django. stations.parsers
+# decodes the format.
+#
+
+MEDIA_TYPE = "application/x-station-readings"
+MAGIC = b"MVR1"
+PREFIX = struct.Struct("<4sI")
+VALUE_DTYPES = {"float32": np.dtype("<f4"), "float64": np.dtype("<f8")}
+# float32 halves the body but rounds values (21.3 becomes 21.2999992...).
+DEFAULT_DTYPE = "float64"
+TIMESTAMP_DTYPE = np.dtype("<i8")
+
+
+def pack_readings(station_id, timestamps, values, location="", dtype=DEFAULT_DTYPE):
+    """
+    Encodes one station's readings in the packed binary format.
+    `values` maps each measurement type to an array aligned with `timestamps`.
+    """
+    timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+    header = json.dumps(
+        {
+            "station_id": station_id,
+            "location": location,
+            "count": len(timestamps),
+            "types": list(values),
+            "dtype": dtype,
+        }
+    ).encode("utf-8")
+    header += b" " * (-(PREFIX.size + len(header)) % 8)
+
+    parts = [PREFIX.pack(MAGIC, len(header)), header, timestamps.tobytes()]
+    for column in values.values():
+        parts.append(np.asarray(column, dtype=VALUE_DTYPES[dtype]).tobytes())
+    return b"".join(parts)
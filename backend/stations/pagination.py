@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class MeasurementKeysetPagination(BasePagination):
+    """
+    Keyset pagination over (recorded_at, id), newest first.
+    Each page is fetched with an index range condition instead of an OFFSET,
+    so deep pages cost the same as the first one. Pagination is opt-in: it is
+    only applied when `cursor` or `page_size` is passed, otherwise the full
+    list is returned as before.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 1000
+    max_page_size = 10000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and (
+            self.page_size_query_param not in params
+        ):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = params.get(self.cursor_query_param)
+
+        queryset = queryset.order_by("-recorded_at", "-id")
+        if cursor:
+            recorded_at, last_id = self.decode_cursor(cursor)
+            # Rows strictly after (recorded_at, last_id) in descending order.
+            # The range condition on recorded_at lets the index do the seek.
+            queryset = queryset.filter(recorded_at__lte=recorded_at).exclude(
+                recorded_at=recorded_at, id__gte=last_id
+            )
+
+        page = list(queryset[: page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.last.recorded_at, self.last.id)
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def encode_cursor(self, recorded_at, last_id):
+        payload = json.dumps([recorded_at.isoformat(), last_id]).encode("ascii")
+        return base64.urlsafe_b64encode(payload).decode("ascii")
+
+    def decode_cursor(self, cursor):
+        try:
+            recorded_at, last_id = json.loads(base64.urlsafe_b64decode(cursor))
+            return datetime.fromisoformat(recorded_at), int(last_id)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,69 @@
+import json
+import numpy as np
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from .packing import (
+    DEFAULT_DTYPE,
+    MAGIC,
+    MEDIA_TYPE,
+    PREFIX,
+    TIMESTAMP_DTYPE,
+    VALUE_DTYPES,
+)
+
+
+def unpack_readings(body):
+    """
+    Decodes a packed body (format in stations.packing) into the columnar
+    payload accepted by DataIngestionView. The arrays are read-only views
+    over `body`.
+    """
+    if len(body) < PREFIX.size:
+        raise ParseError("Packed readings body is truncated.")
+    magic, header_length = PREFIX.unpack_from(body)
+    if magic != MAGIC:
+        raise ParseError("Packed readings body has an unknown signature.")
+
+    header_start, offset = PREFIX.size, PREFIX.size + header_length
+    try:
+        header = json.loads(body[header_start:offset])
+        count = int(header["count"])
+        types = header["types"]
+        dtype = VALUE_DTYPES[header.get("dtype", DEFAULT_DTYPE)]
+    except (ValueError, TypeError, KeyError):
+        raise ParseError("Packed readings header is invalid.")
+    if not isinstance(types, list) or not all(
+        isinstance(m_type, str) and m_type for m_type in types
+    ):
+        raise ParseError("Packed readings types must be a list of non-empty strings.")
+
+    expected = offset + count * (TIMESTAMP_DTYPE.itemsize + len(types) * dtype.itemsize)
+    if count < 0 or len(body) != expected:
+        raise ParseError(
+            f"Packed readings body should be {expected} bytes, got {len(body)}."
+        )
+
+    timestamps = np.frombuffer(body, dtype=TIMESTAMP_DTYPE, count=count, offset=offset)
+    offset += timestamps.nbytes
+    values = {}
+    for m_type in types:
+        values[m_type] = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+
+    return {
+        "station_id": header.get("station_id"),
+        "location": header.get("location", ""),
+        "timestamps": timestamps,
+        "values": values,
+    }
+
+
+class PackedReadingsParser(BaseParser):
+    """Parses `application/x-station-readings` bodies (see unpack_readings())."""
+
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            raise ParseError("Packed readings body is empty.")
+        return unpack_readings(stream.read())
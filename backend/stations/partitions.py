@@ -0,0 +1,126 @@
+import re
+from datetime import datetime, timezone
+from django.db import connection, transaction
+from .models import Measurement
+
+#
+# On PostgreSQL stations_measurement is range partitioned by month on
+# recorded_at (migration 0008). Each month lives in its own table named
+# stations_measurement_yYYYYmMM; readings outside every month land in
+# stations_measurement_default. The manage_partitions command uses these
+# helpers to create upcoming months and detach or drop expired ones.
+#
+
+PARENT_TABLE = Measurement._meta.db_table
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+LIST_PARTITIONS_SQL = """
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = %s
+"""
+
+# Rows of the new month already sitting in the default partition must be
+# moved out first, or attaching the month would violate the default
+# partition's constraint.
+CREATE_PARTITION_SQL = [
+    """
+    CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    """,
+    """
+    WITH moved AS (
+        DELETE FROM {default} WHERE recorded_at >= %s AND recorded_at < %s
+        RETURNING id, measurement_type, value, recorded_at, station_id
+    )
+    INSERT INTO {name} (id, measurement_type, value, recorded_at, station_id)
+    SELECT id, measurement_type, value, recorded_at, station_id FROM moved
+    """,
+    """
+    ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)
+    """,
+]
+
+
+def month_start(dt):
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month):
+    return f"{PARENT_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions():
+    """Returns {month start: table name} for the attached monthly partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(LIST_PARTITIONS_SQL, [PARENT_TABLE])
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            month = datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+            partitions[month] = name
+    return partitions
+
+
+def months_in_default_partition():
+    """Months that have readings in the default partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', recorded_at AT TIME ZONE 'UTC') "
+            f"FROM {DEFAULT_PARTITION}"
+        )
+        return sorted(row[0].replace(tzinfo=timezone.utc) for row in cursor.fetchall())
+
+
+def create_partition(month):
+    """
+    Creates the partition of the month starting at `month`, moving any of
+    its readings out of the default partition. Returns False if it exists.
+    """
+    if month in monthly_partitions():
+        return False
+    names = {
+        "name": connection.ops.quote_name(partition_name(month)),
+        "parent": connection.ops.quote_name(PARENT_TABLE),
+        "default": connection.ops.quote_name(DEFAULT_PARTITION),
+    }
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(CREATE_PARTITION_SQL[0].format(**names))
+        cursor.execute(CREATE_PARTITION_SQL[1].format(**names), bounds)
+        cursor.execute(CREATE_PARTITION_SQL[2].format(**names), bounds)
+    return True
+
+
+def detach_partition(month, drop=False):
+    """
+    Detaches the partition of `month` from stations_measurement, keeping it
+    as a standalone table unless `drop` is set.
+    """
+    name = connection.ops.quote_name(partition_name(month))
+    parent = connection.ops.quote_name(PARENT_TABLE)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
@@ -0,0 +1,315 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from .ingestion import station_readings, write_readings
+from .models import Station
+
+#
+# Durable local queue for /api/iot-data/ uploads.
+#
+# When settings.INGESTION_MODE is "queue", DataIngestionView validates each
+# upload, writes it to the spool directory as one JSON file and returns 202
+# without touching the database. The process_ingestion_queue command drains
+# the spool in large batched transactions.
+#
+# Files move through these states, each step being an atomic rename:
+#   <name>.tmp        being written by the view
+#   <name>.json       ready to be processed
+#   <name>.processing claimed by a worker, deleted once its batch commits
+#   <name>.failed     unreadable or unwritable upload, kept aside for inspection
+#
+# Each web and worker process counts what it enqueued or processed in its own
+# <kind>-<pid>-<token>.stats file next to the spool, so no two processes ever
+# write the same file. queue_stats() sums them, after folding the files that
+# have not been updated for STATS_MERGE_SECONDS (most often left by processes
+# that have exited) into a single <kind>-total.stats file. A process whose
+# file was folded simply starts a new one on its next update.
+#
+
+PENDING_SUFFIX = ".json"
+CLAIMED_SUFFIX = ".processing"
+FAILED_SUFFIX = ".failed"
+STATS_SUFFIX = ".stats"
+
+# Claimed files older than this are assumed to belong to a crashed worker.
+STALE_CLAIM_SECONDS = 10 * 60
+# Stats files idle for longer than this are folded into the total file.
+STATS_MERGE_SECONDS = 60 * 60
+# Counters that add up across stats files. The other fields describe the
+# latest batch and are taken from the file that processed it.
+SUMMED_STATS = [
+    "enqueued_batches",
+    "enqueued_readings",
+    "processed_batches",
+    "processed_readings",
+]
+
+# Errors caused by the content of one upload. They set that upload aside
+# instead of failing its whole batch; anything else (e.g. the database being
+# unreachable) stops the worker and leaves the files claimed.
+UPLOAD_ERRORS = (
+    KeyError,
+    TypeError,
+    ValueError,
+    OverflowError,
+    DataError,
+    IntegrityError,
+)
+
+logger = logging.getLogger(__name__)
+
+# Distinguishes this process from an earlier one that had the same pid.
+_PROCESS_TOKEN = uuid.uuid4().hex[:12]
+# Serializes the updates of this process's stats files across its threads.
+_stats_lock = threading.Lock()
+
+
+def spool_dir():
+    path = Path(settings.INGESTION_SPOOL_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _read_stats(path):
+    try:
+        with open(path, mode="r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_stats(path, stats):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, mode="w", encoding="utf-8") as file:
+        json.dump(stats, file)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _stats_file_lock(kind):
+    """
+    Serializes the updates of the `kind` stats files with their merging, so
+    that no update is lost or counted twice when a file is folded.
+    """
+    with open(spool_dir() / f"{kind}{STATS_SUFFIX}.lock", mode="a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _combine_stats(all_stats):
+    """Sums the counters of several stats dicts into one."""
+    combined = max(all_stats, key=lambda stats: stats.get("last_batch_at", "")).copy()
+    for key in SUMMED_STATS:
+        if any(key in stats for stats in all_stats):
+            combined[key] = sum(stats.get(key, 0) for stats in all_stats)
+    return combined
+
+
+def _update_stats(kind, update):
+    """Applies `update` to the stats dict of this process's `kind` file."""
+    path = spool_dir() / f"{kind}-{os.getpid()}-{_PROCESS_TOKEN}{STATS_SUFFIX}"
+    with _stats_lock, _stats_file_lock(kind):
+        stats = _read_stats(path) or {}
+        update(stats)
+        _write_stats(path, stats)
+
+
+def _merge_idle_stats(kind):
+    """Folds the `kind` stats files idle for STATS_MERGE_SECONDS into one."""
+    total_path = spool_dir() / f"{kind}-total{STATS_SUFFIX}"
+    cutoff = time.time() - STATS_MERGE_SECONDS
+    with _stats_file_lock(kind):
+        idle = []
+        for path in spool_dir().glob(f"{kind}-*{STATS_SUFFIX}"):
+            try:
+                if path != total_path and path.stat().st_mtime < cutoff:
+                    idle.append(path)
+            except FileNotFoundError:
+                continue
+        if not idle:
+            return
+        merged = [
+            stats
+            for stats in map(_read_stats, [total_path, *idle])
+            if stats is not None
+        ]
+        if merged:
+            _write_stats(total_path, _combine_stats(merged))
+        for path in idle:
+            path.unlink(missing_ok=True)
+
+
+def _all_stats(kind):
+    _merge_idle_stats(kind)
+    paths = spool_dir().glob(f"{kind}-*{STATS_SUFFIX}")
+    return [stats for stats in map(_read_stats, paths) if stats is not None]
+
+
+def enqueue(station_id, location, readings):
+    """
+    Appends a validated upload to the spool. `readings` are
+    (type, value, unix_timestamp) tuples as returned by validate_readings().
+    """
+    directory = spool_dir()
+    # Names sort by arrival time, so the worker drains in FIFO order.
+    name = f"{time.time_ns():020d}-{uuid.uuid4().hex}"
+    tmp_path = directory / f"{name}.tmp"
+    with open(tmp_path, mode="w", encoding="utf-8") as file:
+        json.dump(
+            {"station_id": station_id, "location": location, "readings": readings},
+            file,
+        )
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, directory / f"{name}{PENDING_SUFFIX}")
+
+    def count(stats):
+        stats["enqueued_batches"] = stats.get("enqueued_batches", 0) + 1
+        stats["enqueued_readings"] = stats.get("enqueued_readings", 0) + len(readings)
+
+    _update_stats("enqueue", count)
+
+
+def claim(limit):
+    """Claims up to `limit` of the oldest pending files for this worker."""
+    claimed = []
+    for path in sorted(spool_dir().glob(f"*{PENDING_SUFFIX}")):
+        if len(claimed) >= limit:
+            break
+        target = path.with_suffix(CLAIMED_SUFFIX)
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            continue  # Claimed by another worker first.
+        # Stale claims are detected by mtime, so start the clock now.
+        os.utime(target)
+        claimed.append(target)
+    return claimed
+
+
+def release_stale_claims():
+    """Returns files claimed by a crashed worker to the pending state."""
+    released = 0
+    cutoff = time.time() - STALE_CLAIM_SECONDS
+    for path in spool_dir().glob(f"*{CLAIMED_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                os.rename(path, path.with_suffix(PENDING_SUFFIX))
+                released += 1
+        except FileNotFoundError:
+            continue
+    return released
+
+
+def _write_uploads(uploads):
+    """Writes uploads in one transaction. Returns the number of readings."""
+    readings = []
+    with transaction.atomic():
+        stations = {}
+        for upload in uploads:
+            stations.setdefault(upload["station_id"], upload.get("location") or "")
+        existing = set(
+            Station.objects.filter(station_id__in=stations).values_list(
+                "station_id", flat=True
+            )
+        )
+        Station.objects.bulk_create(
+            [
+                Station(
+                    station_id=station_id,
+                    name=location or f"Station {station_id}",
+                    location=location,
+                )
+                for station_id, location in stations.items()
+                if station_id not in existing
+            ],
+            ignore_conflicts=True,
+        )
+
+        for upload in uploads:
+            readings.extend(station_readings(upload["station_id"], upload["readings"]))
+        write_readings(readings)
+    return len(readings)
+
+
+def process_batch(paths):
+    """
+    Writes the readings of the claimed files in a single transaction and
+    deletes the files once it has committed. If an upload cannot be written,
+    the files are retried one transaction each and the failing ones are set
+    aside as failed. Returns the number of readings written.
+    """
+    uploads = {}
+    for path in paths:
+        try:
+            with open(path, mode="r", encoding="utf-8") as file:
+                uploads[path] = json.load(file)
+        except ValueError:
+            os.rename(path, path.with_suffix(FAILED_SUFFIX))
+
+    try:
+        written = _write_uploads(list(uploads.values()))
+    except UPLOAD_ERRORS:
+        written = 0
+        for path, upload in uploads.items():
+            try:
+                written += _write_uploads([upload])
+            except UPLOAD_ERRORS:
+                logger.exception("Setting aside queued upload %s", path.name)
+                os.rename(path, path.with_suffix(FAILED_SUFFIX))
+
+    for path in paths:
+        # Files set aside as failed above no longer exist under this name.
+        path.unlink(missing_ok=True)
+    return written
+
+
+def record_worker_stats(batches, readings, elapsed):
+    """Accumulates the throughput of this worker process in its stats file."""
+
+    def count(stats):
+        stats["processed_batches"] = stats.get("processed_batches", 0) + batches
+        stats["processed_readings"] = stats.get("processed_readings", 0) + readings
+        stats["last_batch_at"] = datetime.now(timezone.utc).isoformat()
+        stats["last_batch_readings"] = readings
+        stats["last_batch_rows_per_second"] = round(readings / max(elapsed, 1e-9))
+
+    _update_stats("worker", count)
+
+
+def queue_stats():
+    """Queue depth plus enqueue and worker throughput counters."""
+    directory = spool_dir()
+    pending = list(directory.glob(f"*{PENDING_SUFFIX}"))
+    oldest_age = None
+    if pending:
+        oldest = min(pending)
+        try:
+            oldest_age = round(time.time() - oldest.stat().st_mtime, 1)
+        except FileNotFoundError:
+            pass
+
+    enqueued = _all_stats("enqueue")
+    workers = _all_stats("worker")
+    # Totals of all workers, and the latest batch of any of them.
+    worker = _combine_stats(workers) if workers else None
+
+    return {
+        "mode": settings.INGESTION_MODE,
+        "pending_batches": len(pending),
+        "in_progress_batches": len(list(directory.glob(f"*{CLAIMED_SUFFIX}"))),
+        "failed_batches": len(list(directory.glob(f"*{FAILED_SUFFIX}"))),
+        "oldest_pending_age_seconds": oldest_age,
+        "enqueued_batches": sum(stats["enqueued_batches"] for stats in enqueued),
+        "enqueued_readings": sum(stats["enqueued_readings"] for stats in enqueued),
+        "worker": worker,
+    }
@@ -0,0 +1,132 @@
+import orjson
+from datetime import datetime
+from functools import cached_property
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+from rest_framework.renderers import JSONRenderer
+from rest_framework_csv.renderers import CSVRenderer
+
+#
+# Fast JSON path for raw measurement reads. Instead of a MeasurementSerializer
+# instance per row, MeasurementViewSet hands MeasurementJSONRenderer the
+# values_list() tuples wrapped in MeasurementRows, and orjson encodes them.
+# The bytes are identical to what JSONRenderer produces from the serializer:
+# keys in MeasurementSerializer.Meta.fields order, timestamps formatted by
+# DRF's DateTimeField (microseconds kept, "Z" for UTC) and floats as repr().
+#
+
+# orjson writes floats like repr() except in exponent notation ("1e16" for
+# "1e+16", "0.00001" for "1e-05"). Rows holding such values, or NaN and
+# infinity (which JSONRenderer rejects), go through the stdlib encoder.
+PLAIN_FLOAT_RANGE = (1e-4, 1e16)
+
+# JSONRenderer escapes these to keep the output a JavaScript subset.
+LINE_SEPARATORS = [
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+]
+
+
+class MeasurementRows:
+    """
+    Raw readings as tuples of `fields` values, rendered like
+    MeasurementSerializer(many=True, fields=fields).data. Iterating or
+    comparing it goes through that same representation, built on demand.
+    """
+
+    def __init__(self, rows, fields):
+        self.rows = rows
+        self.fields = list(fields)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __eq__(self, other):
+        return self.data == other
+
+    def plain_dicts(self):
+        """
+        The rows as dicts of native values for orjson, or None if a value
+        would not be written the way JSONRenderer writes it.
+        """
+        if timezone.get_current_timezone_name() != "UTC":
+            return None
+        if "value" in self.fields:
+            low, high = PLAIN_FLOAT_RANGE
+            index = self.fields.index("value")
+            for row in self.rows:
+                value = row[index]
+                if not low <= abs(value) < high and value != 0:
+                    return None
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in self.rows]
+
+    @cached_property
+    def data(self):
+        """The rows as the serializer would return them."""
+        datetime_field = DateTimeField()
+        converters = {
+            "measurement_type": str,
+            "value": float,
+            "recorded_at": datetime_field.to_representation,
+        }
+        fields = [(field, converters[field]) for field in self.fields]
+        return [
+            {field: convert(value) for (field, convert), value in zip(fields, row)}
+            for row in self.rows
+        ]
+
+
+class MeasurementJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes MeasurementRows (bare or as the `results` of
+    a page) with orjson. Everything else is rendered by JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        page = isinstance(data, dict) and isinstance(
+            data.get("results"), MeasurementRows
+        )
+        rows = data["results"] if page else data
+        if not isinstance(rows, MeasurementRows):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        plain = None
+        if indent is None and self.compact and self.strict and not self.ensure_ascii:
+            plain = rows.plain_dicts()
+        if plain is None:
+            results = rows.data
+            data = {**data, "results": results} if page else results
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            {**data, "results": plain} if page else plain,
+            option=orjson.OPT_UTC_Z,
+        )
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in ret:
+                ret = ret.replace(separator, escaped)
+        return ret
+
+
+class MeasurementCSVRenderer(CSVRenderer):
+    """
+    CSVRenderer that writes datetimes like MeasurementSerializer does
+    ("...Z" for UTC), so downsampled, wide and compared rows, which are
+    built without the serializer, match the raw readings.
+    """
+
+    def flatten_item(self, item):
+        flat_item = super().flatten_item(item)
+        to_representation = DateTimeField().to_representation
+        for key, value in flat_item.items():
+            if isinstance(value, datetime):
+                flat_item[key] = to_representation(value)
+        return flat_item
@@ -0,0 +1,425 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from .archive import archived_bounds, archived_hourly, archived_months
+from .models import Measurement, MeasurementHourly, MeasurementDaily, MeasurementSummary
+from .partitions import month_start
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+# Rollup model for each bucket width, finest first.
+ROLLUP_MODELS = [(HOUR, MeasurementHourly), (DAY, MeasurementDaily)]
+
+# Touched hours at most this far apart are refreshed as one range.
+REFRESH_GAP = DAY
+
+ROLLUP_FIELDS = ["reading_count", "min_value", "max_value", "sum_value", "avg_value"]
+
+
+def floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(dt):
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upsert(model, rows):
+    model.objects.bulk_create(
+        [
+            model(
+                station_id=row["station_id"],
+                measurement_type=row["measurement_type"],
+                bucket=row["bucket"],
+                reading_count=row["reading_count"],
+                min_value=row["min_value"],
+                max_value=row["max_value"],
+                sum_value=row["sum_value"],
+                avg_value=row["sum_value"] / row["reading_count"],
+            )
+            for row in rows
+        ],
+        update_conflicts=True,
+        unique_fields=["station", "measurement_type", "bucket"],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+# On PostgreSQL each refresh is a single INSERT ... SELECT ... ON CONFLICT
+# statement, so the aggregated rows never travel through Python.
+REFRESH_HOURLY_SQL = """
+INSERT INTO {hourly} (station_id, measurement_type, bucket,
+    reading_count, min_value, max_value, sum_value, avg_value)
+SELECT station_id, measurement_type, date_trunc('hour', recorded_at),
+    COUNT(*), MIN(value), MAX(value), SUM(value), AVG(value)
+FROM {measurement}
+WHERE station_id = %s AND recorded_at >= %s AND recorded_at < %s
+GROUP BY 1, 2, 3
+ON CONFLICT (station_id, measurement_type, bucket) DO UPDATE SET
+    reading_count = EXCLUDED.reading_count, min_value = EXCLUDED.min_value,
+    max_value = EXCLUDED.max_value, sum_value = EXCLUDED.sum_value,
+    avg_value = EXCLUDED.avg_value
+"""
+
+REFRESH_DAILY_SQL = """
+INSERT INTO {daily} (station_id, measurement_type, bucket,
+    reading_count, min_value, max_value, sum_value, avg_value)
+SELECT station_id, measurement_type, date_trunc('day', bucket),
+    SUM(reading_count), MIN(min_value), MAX(max_value), SUM(sum_value),
+    SUM(sum_value) / SUM(reading_count)
+FROM {hourly}
+WHERE station_id = %s AND bucket >= %s AND bucket < %s
+GROUP BY 1, 2, 3
+ON CONFLICT (station_id, measurement_type, bucket) DO UPDATE SET
+    reading_count = EXCLUDED.reading_count, min_value = EXCLUDED.min_value,
+    max_value = EXCLUDED.max_value, sum_value = EXCLUDED.sum_value,
+    avg_value = EXCLUDED.avg_value
+"""
+
+
+def _hourly_rows(station_id, start, end):
+    """Hourly aggregates of the raw readings of a station within [start, end)."""
+    return (
+        Measurement.objects.filter(
+            station_id=station_id, recorded_at__gte=start, recorded_at__lt=end
+        )
+        .order_by()
+        .annotate(bucket=TruncHour("recorded_at"))
+        .values("station_id", "measurement_type", "bucket")
+        .annotate(
+            reading_count=Count("id"),
+            min_value=Min("value"),
+            max_value=Max("value"),
+            sum_value=Sum("value"),
+        )
+    )
+
+
+def _merge_archived(rows, station_id, archived):
+    """Adds archived hourly aggregates to the raw ones (see archived_hourly())."""
+    merged = {(row["measurement_type"], row["bucket"]): row for row in rows}
+    for (m_type, bucket), (count, low, high, total) in archived.items():
+        row = merged.get((m_type, bucket))
+        if row is None:
+            merged[(m_type, bucket)] = {
+                "station_id": station_id,
+                "measurement_type": m_type,
+                "bucket": bucket,
+                "reading_count": count,
+                "min_value": low,
+                "max_value": high,
+                "sum_value": total,
+            }
+        else:
+            row["reading_count"] += count
+            row["min_value"] = min(row["min_value"], low)
+            row["max_value"] = max(row["max_value"], high)
+            row["sum_value"] += total
+    return merged.values()
+
+
+def refresh_rollups(station_id, start, end):
+    """
+    Recomputes the hourly and daily rollups of a station for every bucket
+    touching [start, end]. Hourly rows are aggregated from the raw readings
+    and daily rows from the hourly ones, so the cost is bounded by the
+    number of readings in the affected hours. Hours of archived months also
+    count the readings in their Parquet files. The station's summary rows
+    are updated as well.
+    """
+    hour_start, hour_end = floor_hour(start), floor_hour(end) + HOUR
+    day_start, day_end = floor_day(start), floor_day(end) + DAY
+    # Readings moved to Parquet are no longer in the table, so late readings
+    # of an archived month must not replace the rollups computed from them.
+    archived = any(
+        month_start(hour_start) <= month < hour_end
+        for month in archived_months(station_id)
+    )
+    if archived:
+        rows = _hourly_rows(station_id, hour_start, hour_end)
+        # Late duplicates of archived readings are dropped when archived.
+        in_table = set(
+            Measurement.objects.filter(
+                station_id=station_id,
+                recorded_at__gte=hour_start,
+                recorded_at__lt=hour_end,
+            ).values_list("measurement_type", "recorded_at")
+        )
+        _upsert(
+            MeasurementHourly,
+            _merge_archived(
+                rows,
+                station_id,
+                archived_hourly(station_id, hour_start, hour_end, exclude=in_table),
+            ),
+        )
+
+    if connection.vendor == "postgresql":
+        tables = {
+            "measurement": Measurement._meta.db_table,
+            "hourly": MeasurementHourly._meta.db_table,
+            "daily": MeasurementDaily._meta.db_table,
+        }
+        with connection.cursor() as cursor:
+            if not archived:
+                cursor.execute(
+                    REFRESH_HOURLY_SQL.format(**tables),
+                    [station_id, hour_start, hour_end],
+                )
+            cursor.execute(
+                REFRESH_DAILY_SQL.format(**tables), [station_id, day_start, day_end]
+            )
+        refresh_summary(station_id, start, end)
+        return
+
+    if not archived:
+        _upsert(MeasurementHourly, _hourly_rows(station_id, hour_start, hour_end))
+
+    daily = (
+        MeasurementHourly.objects.filter(
+            station_id=station_id, bucket__gte=day_start, bucket__lt=day_end
+        )
+        .order_by()
+        .annotate(day=TruncDay("bucket"))
+        .values("station_id", "measurement_type", "day")
+        .annotate(
+            total_count=Sum("reading_count"),
+            lowest=Min("min_value"),
+            highest=Max("max_value"),
+            total=Sum("sum_value"),
+        )
+    )
+    _upsert(
+        MeasurementDaily,
+        (
+            {
+                "station_id": row["station_id"],
+                "measurement_type": row["measurement_type"],
+                "bucket": row["day"],
+                "reading_count": row["total_count"],
+                "min_value": row["lowest"],
+                "max_value": row["highest"],
+                "sum_value": row["total"],
+            }
+            for row in daily
+        ),
+    )
+    refresh_summary(station_id, start, end)
+
+
+# The first/last times only ever widen here, from the readings in the
+# refreshed range, and the latest value follows the last time. The count is
+# re-summed from the daily rollups. Use rebuild_summary() after readings
+# were deleted.
+REFRESH_SUMMARY_SQL = """
+INSERT INTO {summary} (station_id, measurement_type, first_recorded_at,
+    last_recorded_at, last_value, reading_count, updated_at)
+SELECT m.station_id, m.measurement_type, MIN(m.recorded_at), MAX(m.recorded_at),
+    (SELECT l.value FROM {measurement} l
+     WHERE l.station_id = m.station_id AND l.measurement_type = m.measurement_type
+        AND l.recorded_at = MAX(m.recorded_at)),
+    (SELECT SUM(d.reading_count) FROM {daily} d
+     WHERE d.station_id = m.station_id AND d.measurement_type = m.measurement_type),
+    %s
+FROM {measurement} m
+WHERE m.station_id = %s AND m.recorded_at >= %s AND m.recorded_at <= %s
+GROUP BY 1, 2
+ON CONFLICT (station_id, measurement_type) DO UPDATE SET
+    first_recorded_at = LEAST({summary}.first_recorded_at, EXCLUDED.first_recorded_at),
+    last_recorded_at = GREATEST({summary}.last_recorded_at, EXCLUDED.last_recorded_at),
+    last_value = CASE WHEN EXCLUDED.last_recorded_at >= {summary}.last_recorded_at
+        THEN EXCLUDED.last_value ELSE {summary}.last_value END,
+    reading_count = EXCLUDED.reading_count, updated_at = EXCLUDED.updated_at
+"""
+
+
+def refresh_summary(station_id, start, end):
+    """
+    Folds the readings of a station between start and end into its
+    MeasurementSummary rows. Must run after the daily rollups are refreshed.
+    Readings before the station's watermark (see stations.http_cache) mark
+    its history as changed.
+    """
+    now = timezone.now()
+    last = MeasurementSummary.objects.filter(station_id=station_id).aggregate(
+        last=Max("last_recorded_at")
+    )["last"]
+    horizon = timedelta(seconds=settings.MEASUREMENT_INGEST_HORIZON)
+    if connection.vendor == "postgresql":
+        tables = {
+            "measurement": Measurement._meta.db_table,
+            "daily": MeasurementDaily._meta.db_table,
+            "summary": MeasurementSummary._meta.db_table,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(
+                REFRESH_SUMMARY_SQL.format(**tables), [now, station_id, start, end]
+            )
+    else:
+        _refresh_summary_rows(station_id, start, end, now)
+    if last is not None and start < last - horizon:
+        mark_history_changed(station_id, now)
+
+
+def _refresh_summary_rows(station_id, start, end, now):
+    """REFRESH_SUMMARY_SQL through the ORM, for other databases."""
+    ranges = (
+        Measurement.objects.filter(
+            station_id=station_id, recorded_at__gte=start, recorded_at__lte=end
+        )
+        .order_by()
+        .values("measurement_type")
+        .annotate(first=Min("recorded_at"), last=Max("recorded_at"))
+    )
+    counts = dict(
+        MeasurementDaily.objects.filter(station_id=station_id)
+        .order_by()
+        .values("measurement_type")
+        .annotate(total=Sum("reading_count"))
+        .values_list("measurement_type", "total")
+    )
+    existing = {
+        s.measurement_type: s
+        for s in MeasurementSummary.objects.filter(station_id=station_id)
+    }
+    rows = []
+    for row in ranges:
+        m_type = row["measurement_type"]
+        first, last = row["first"], row["last"]
+        summary = existing.get(m_type)
+        if summary is not None and summary.last_recorded_at > last:
+            last, last_value = summary.last_recorded_at, summary.last_value
+        else:
+            last_value = (
+                Measurement.objects.filter(
+                    station_id=station_id, measurement_type=m_type, recorded_at=last
+                )
+                .values_list("value", flat=True)
+                .first()
+            )
+        if summary is not None:
+            first = min(first, summary.first_recorded_at)
+        rows.append(
+            MeasurementSummary(
+                station_id=station_id,
+                measurement_type=m_type,
+                first_recorded_at=first,
+                last_recorded_at=last,
+                last_value=last_value,
+                reading_count=counts.get(m_type, 0),
+                updated_at=now,
+            )
+        )
+    MeasurementSummary.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["station", "measurement_type"],
+        update_fields=[
+            "first_recorded_at",
+            "last_recorded_at",
+            "last_value",
+            "reading_count",
+            "updated_at",
+        ],
+    )
+
+
+def mark_history_changed(station_id, now=None):
+    """
+    Records that readings a station already served as historical changed,
+    which invalidates their cached responses.
+    """
+    MeasurementSummary.objects.filter(station_id=station_id).update(
+        history_changed_at=now or timezone.now()
+    )
+
+
+def rebuild_summary(station_id):
+    """
+    Recomputes the MeasurementSummary rows of a station from scratch, from
+    its raw readings and archived months.
+    """
+    MeasurementSummary.objects.filter(station_id=station_id).delete()
+    bounds = Measurement.objects.filter(station_id=station_id).aggregate(
+        start=Min("recorded_at"), end=Max("recorded_at")
+    )
+    if bounds["start"] is not None:
+        refresh_summary(station_id, bounds["start"], bounds["end"])
+
+    # Archived readings are only in Parquet; their counts are in the rollups.
+    archived = archived_bounds(station_id)
+    if archived:
+        _merge_archived_summaries(station_id, archived)
+    mark_history_changed(station_id)
+
+
+def _merge_archived_summaries(station_id, archived):
+    """Widens the summaries of a station with archived_bounds()."""
+    counts = dict(
+        MeasurementDaily.objects.filter(station_id=station_id)
+        .order_by()
+        .values("measurement_type")
+        .annotate(total=Sum("reading_count"))
+        .values_list("measurement_type", "total")
+    )
+    existing = {
+        s.measurement_type: s
+        for s in MeasurementSummary.objects.filter(station_id=station_id)
+    }
+    now = timezone.now()
+    for m_type, (first, last, last_value) in archived.items():
+        summary = existing.get(m_type) or MeasurementSummary(
+            station_id=station_id,
+            measurement_type=m_type,
+            first_recorded_at=first,
+            last_recorded_at=last,
+            last_value=last_value,
+        )
+        summary.first_recorded_at = min(summary.first_recorded_at, first)
+        if last > summary.last_recorded_at:
+            summary.last_recorded_at, summary.last_value = last, last_value
+        summary.reading_count = counts.get(m_type, 0)
+        summary.updated_at = now
+        summary.save()
+
+
+def refresh_rollups_for(readings):
+    """
+    Refreshes the rollups touched by newly written readings, given as
+    (station_id, recorded_at) pairs. Each station's readings are split into
+    runs wherever touched hours are more than REFRESH_GAP apart, so an old
+    reading uploaded along with current ones does not re-aggregate the whole
+    history between them.
+    """
+    times = {}
+    for station_id, recorded_at in readings:
+        times.setdefault(station_id, []).append(recorded_at)
+
+    for station_id, station_times in times.items():
+        station_times.sort()
+        start = previous = station_times[0]
+        for recorded_at in station_times[1:]:
+            if floor_hour(recorded_at) - floor_hour(previous) > REFRESH_GAP:
+                refresh_rollups(station_id, start, previous)
+                start = recorded_at
+            previous = recorded_at
+        refresh_rollups(station_id, start, previous)
+
+
+def rebuild_rollups(station_id, start, end):
+    """
+    Drops and recomputes the rollups of a station between start and end,
+    e.g. after raw readings were deleted or loaded outside the normal paths.
+    """
+    for width, model in ROLLUP_MODELS:
+        floor = floor_hour if width == HOUR else floor_day
+        model.objects.filter(
+            station_id=station_id,
+            bucket__gte=floor(start),
+            bucket__lt=floor(end) + width,
+        ).delete()
+    refresh_rollups(station_id, start, end)
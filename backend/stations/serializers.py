@@ -1,6 +1,13 @@
+import math
 from rest_framework import serializers
 from .models import Station, Measurement
 
+# Accepted recorded_at range, 1970-01-01 to 2100-01-01 UTC. Well inside the
+# datetime range, so the rollups and summaries can add and subtract their
+# bucket widths and ingest horizon around any accepted reading.
+MIN_UNIX_TIMESTAMP = 0
+MAX_UNIX_TIMESTAMP = 4102444800
+
 
 class StationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,10 +20,25 @@ class MeasurementSerializer(serializers.ModelSerializer):
         model = Measurement
         fields = ["measurement_type", "value", "recorded_at"]
 
+    def __init__(self, *args, fields=None, **kwargs):
+        # `fields` optionally restricts the output to a subset of Meta.fields.
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 # Serializer for data ingestion (compatible with send_iot_data.py)
 class MeasurementCreateSerializer(serializers.Serializer):
     type = serializers.CharField(max_length=100)
     value = serializers.FloatField()
     # IntegerField is used because the incoming data will be a Unix timestamp (integer)
-    recorded_at = serializers.IntegerField()
+    recorded_at = serializers.IntegerField(
+        min_value=MIN_UNIX_TIMESTAMP, max_value=MAX_UNIX_TIMESTAMP
+    )
+
+    def validate_value(self, value):
+        # JSON cannot represent infinity or NaN, so they could not be served.
+        if not math.isfinite(value):
+            raise serializers.ValidationError("value must be a finite number.")
+        return value
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import station_cache
+from .models import Station
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidate_station_cache(sender, instance, **kwargs):
+    station_cache.forget(instance.station_id)
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from .models import Station
+
+#
+# Cache of station IDs known to exist, so steady-state ingestion skips the
+# Station get_or_create query. Entries live in a per-process LRU; with
+# STATION_CACHE_ALIAS set, a shared Django cache (e.g. Redis) backs it so
+# other workers' lookups are reused too. Saving or deleting a Station
+# invalidates its entry (see stations.signals). Local entries also expire
+# after STATION_CACHE_TTL, which bounds how long another process can keep
+# trusting a station that was deleted elsewhere.
+#
+
+SHARED_KEY_PREFIX = "station-known:"
+
+_known = OrderedDict()
+_lock = threading.Lock()
+
+
+def _shared_cache():
+    alias = getattr(settings, "STATION_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def is_known(station_id):
+    now = time.monotonic()
+    with _lock:
+        expires = _known.get(station_id)
+        if expires is not None:
+            if expires > now:
+                _known.move_to_end(station_id)
+                return True
+            del _known[station_id]
+
+    shared = _shared_cache()
+    if shared is not None and shared.get(SHARED_KEY_PREFIX + station_id):
+        _remember_locally(station_id)
+        return True
+    return False
+
+
+def _remember_locally(station_id):
+    with _lock:
+        _known[station_id] = time.monotonic() + settings.STATION_CACHE_TTL
+        _known.move_to_end(station_id)
+        while len(_known) > settings.STATION_CACHE_SIZE:
+            _known.popitem(last=False)
+
+
+def remember(station_id):
+    _remember_locally(station_id)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(SHARED_KEY_PREFIX + station_id, True, settings.STATION_CACHE_TTL)
+
+
+def forget(station_id):
+    with _lock:
+        _known.pop(station_id, None)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(SHARED_KEY_PREFIX + station_id)
+
+
+def clear():
+    with _lock:
+        _known.clear()
+
+
+def ensure_station(station_id, location=None):
+    """
+    Creates the station on its first upload. Returns True if it was created.
+    Known stations are answered from the cache without a query.
+    """
+    station_id = str(station_id)
+    if is_known(station_id):
+        return False
+    _, created = Station.objects.get_or_create(
+        station_id=station_id,
+        defaults={
+            "name": location if location is not None else f"Station {station_id}",
+            "location": location or "",
+        },
+    )
+    # Only trust the station once it is committed.
+    transaction.on_commit(lambda: remember(station_id))
+    return created
@@ -0,0 +1,158 @@
+import hashlib
+import numpy as np
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, FloatField, Max, Min, StdDev
+from .archive import archived_months, archived_rows
+from .models import Measurement, MeasurementSummary
+from .partitions import month_start
+
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+
+
+class PercentileCont(Aggregate):
+    """Continuous percentiles of a column, as one array (PostgreSQL)."""
+
+    output_field = ArrayField(FloatField())
+
+    def __init__(self, expression, fractions, **extra):
+        self.fractions = fractions
+        super().__init__(expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        value_sql, value_params = compiler.compile(self.source_expressions[0])
+        placeholders = ", ".join(["%s"] * len(self.fractions))
+        sql = (
+            f"PERCENTILE_CONT(ARRAY[{placeholders}]::double precision[]) "
+            f"WITHIN GROUP (ORDER BY {value_sql})"
+        )
+        return sql, (*self.fractions, *value_params)
+
+
+def _row(m_type, count, low, high, mean, stddev, values, percentiles):
+    return {
+        "measurement_type": m_type,
+        "count": count,
+        "min": low,
+        "max": high,
+        "mean": mean,
+        "stddev": stddev,
+        "percentiles": {f"p{p:g}": v for p, v in zip(percentiles, values)},
+    }
+
+
+def _sql_stats(queryset, percentiles):
+    fractions = [p / 100 for p in percentiles]
+    rows = (
+        queryset.order_by()
+        .values("measurement_type")
+        .annotate(
+            count=Count("id"),
+            low=Min("value"),
+            high=Max("value"),
+            mean=Avg("value"),
+            stddev=StdDev("value", sample=True),
+            values=PercentileCont("value", fractions),
+        )
+        .order_by("measurement_type")
+    )
+    return [
+        _row(
+            r["measurement_type"],
+            r["count"],
+            r["low"],
+            r["high"],
+            r["mean"],
+            r["stddev"],
+            r["values"],
+            percentiles,
+        )
+        for r in rows
+    ]
+
+
+def _numpy_stats(readings, percentiles):
+    """Same statistics from (measurement_type, value) pairs, in Python."""
+    by_type = {}
+    for m_type, value in readings:
+        by_type.setdefault(m_type, []).append(value)
+
+    rows = []
+    for m_type in sorted(by_type):
+        values = np.asarray(by_type[m_type], dtype=np.float64)
+        rows.append(
+            _row(
+                m_type,
+                int(values.size),
+                float(values.min()),
+                float(values.max()),
+                float(values.mean()),
+                float(values.std(ddof=1)) if values.size > 1 else None,
+                # "linear" interpolation is what PERCENTILE_CONT computes.
+                np.percentile(values, percentiles, method="linear").tolist(),
+                percentiles,
+            )
+        )
+    return rows
+
+
+def measurement_stats(station_id, start, end, types=None, percentiles=None):
+    """
+    Count, min, max, mean, sample standard deviation and percentiles of
+    each measurement type of a station over [start, end]. On PostgreSQL
+    this is one aggregate query; elsewhere, or when the range reaches
+    archived months, the values are aggregated with NumPy.
+    """
+    percentiles = percentiles or DEFAULT_PERCENTILES
+    queryset = Measurement.objects.filter(
+        station_id=station_id, recorded_at__gte=start, recorded_at__lte=end
+    )
+    if types:
+        queryset = queryset.filter(measurement_type__in=types)
+
+    archived = [
+        month
+        for month in archived_months(station_id)
+        if month_start(start) <= month <= end
+    ]
+    if connection.vendor == "postgresql" and not archived:
+        return _sql_stats(queryset, percentiles)
+
+    readings = list(queryset.values_list("measurement_type", "value"))
+    if archived:
+        readings += [
+            (m_type, value)
+            for m_type, value, _ in archived_rows(station_id, start, end)
+            if not types or m_type in types
+        ]
+    return _numpy_stats(readings, percentiles)
+
+
+def cached_measurement_stats(station_id, start, end, types=None, percentiles=None):
+    """
+    measurement_stats() cached per station, types, range and percentiles.
+    The key includes when the station's summary last changed, so new
+    readings for the station make older entries unreachable.
+    """
+    changed = (
+        MeasurementSummary.objects.filter(station_id=station_id)
+        .order_by("-updated_at")
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    parts = [
+        station_id,
+        ",".join(sorted(types or [])),
+        start.isoformat(),
+        end.isoformat(),
+        ",".join(f"{p:g}" for p in percentiles or DEFAULT_PERCENTILES),
+        changed.isoformat() if changed else "",
+    ]
+    key = "station-stats:" + hashlib.md5("|".join(parts).encode()).hexdigest()
+    stats = cache.get(key)
+    if stats is None:
+        stats = measurement_stats(station_id, start, end, types, percentiles)
+        cache.set(key, stats, settings.STATION_STATS_CACHE_TIMEOUT)
+    return stats
@@ -1,15 +1,61 @@
+import gzip
+import importlib
+import json
+import os
 import pytest
+import time
+import zstandard
+from pathlib import Path
+from types import SimpleNamespace
+from django.apps import apps as django_apps
+from django.conf import settings
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import CustomUser
-from .models import Station, Measurement
+from .models import (
+    Station,
+    Measurement,
+    MeasurementHourly,
+    MeasurementDaily,
+    MeasurementSummary,
+)
+from .packing import pack_readings
+from .parsers import PackedReadingsParser
+from .renderers import MeasurementRows
+from .serializers import MeasurementSerializer
+from . import station_cache
+from .archive import archive_path
+from . import rollups
+from .rollups import refresh_rollups
+from .queue import STATS_MERGE_SECONDS
+from .stats import _numpy_stats
+from .partitions import (
+    add_months,
+    month_start,
+    monthly_partitions,
+    months_in_default_partition,
+)
 from datetime import datetime, timezone, timedelta
 
 # Mark all tests in this file as Django DB tests
 pytestmark = pytest.mark.django_db
 
 
+@pytest.fixture(autouse=True)
+def clear_station_cache():
+    # Test transactions are rolled back without firing the Station signals.
+    station_cache.clear()
+    yield
+    station_cache.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -150,6 +196,22 @@ class TestMeasurementViewSet:
         assert len(response.data) == 1
         assert response.data[0]["measurement_type"] == "humidity"
 
+    def test_mixed_naive_and_aware_range(self, api_client, regular_user):
+        api_client.force_authenticate(user=regular_user)
+        params = {
+            "station_id": self.station.station_id,
+            "start": (self.now - timedelta(days=2)).replace(tzinfo=None).isoformat(),
+            "end": (self.now + timedelta(days=1)).isoformat(),
+        }
+        response = api_client.get(reverse("measurement-list"), params)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 2
+
+        params["type"] = "humidity"
+        response = api_client.get(reverse("measurement-compare"), params)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+
     def test_csv_renderer_works(self, api_client, regular_user):
         api_client.force_authenticate(user=regular_user)
         start_date = (self.now - timedelta(days=2)).isoformat().replace("+00:00", "Z")
@@ -170,6 +232,401 @@ class TestMeasurementViewSet:
         assert "temperature" in temp_line[0]
         assert "25.5" in temp_line[0]
 
+    def test_streaming_export(self, api_client, regular_user):
+        api_client.force_authenticate(user=regular_user)
+        start_date = (self.now - timedelta(days=2)).isoformat().replace("+00:00", "Z")
+        end_date = (self.now + timedelta(days=1)).isoformat().replace("+00:00", "Z")
+        url = f"{reverse('measurement-export')}?station_id={self.station.station_id}&start={start_date}&end={end_date}"
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert "text/csv" in response["Content-Type"]
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        assert lines[0] == "measurement_type,value,recorded_at"
+        assert lines[1].startswith("humidity,60.1,")
+        assert lines[2].startswith("temperature,25.5,")
+        assert lines[2].endswith("Z")
+
+    def test_export_requires_range(self, api_client, regular_user):
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(reverse("measurement-export"))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestMeasurementDownsampling:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user, active_station):
+        api_client.force_authenticate(user=regular_user)
+        self.client = api_client
+        self.station = active_station
+        self.hour = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+        for minute, value in [(0, 10.0), (20, 20.0), (40, 30.0)]:
+            Measurement.objects.create(
+                station=self.station,
+                measurement_type="temperature",
+                value=value,
+                recorded_at=self.hour + timedelta(minutes=minute),
+            )
+
+    def get(self, **params):
+        params = {
+            "station_id": self.station.station_id,
+            "start": "2024-01-01T00:00:00Z",
+            "end": "2024-01-02T00:00:00Z",
+            **params,
+        }
+        return self.client.get(reverse("measurement-list"), params)
+
+    def test_hourly_average(self):
+        response = self.get(interval="1h", agg="avg")
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        assert response.data[0]["value"] == 20.0
+        assert response.data[0]["recorded_at"] == self.hour
+
+    def test_csv_timestamps_match_raw_rows(self):
+        for layout in ["long", "wide"]:
+            response = self.client.get(
+                reverse("measurement-list"),
+                {
+                    "station_id": self.station.station_id,
+                    "start": "2024-01-01T00:00:00Z",
+                    "end": "2024-01-02T00:00:00Z",
+                    "interval": "1h",
+                    "layout": layout,
+                },
+                HTTP_ACCEPT="text/csv",
+            )
+            content = response.content.decode()
+            assert "2024-01-01T10:00:00Z" in content
+            assert "+00:00" not in content
+
+    def test_last_value_per_bucket(self):
+        response = self.get(interval="5m", agg="last")
+        assert [row["value"] for row in response.data] == [30.0, 20.0, 10.0]
+        response = self.get(interval="1d", agg="last")
+        assert response.data[0]["value"] == 30.0
+
+    def test_auto_interval(self):
+        response = self.get(interval="auto", agg="max")
+        assert response.status_code == status.HTTP_200_OK
+        assert [row["value"] for row in response.data] == [30.0, 20.0, 10.0]
+
+    def test_wide_layout_pivots_buckets(self):
+        Measurement.objects.create(
+            station=self.station,
+            measurement_type="humidity",
+            value=50.0,
+            recorded_at=self.hour,
+        )
+        response = self.get(interval="1h", agg="max", layout="wide")
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        row = response.data[0]
+        assert row["recorded_at"] == self.hour
+        assert row["temperature"] == 30.0
+        assert row["humidity"] == 50.0
+        assert row["pluviometer"] is None
+
+    def test_wide_layout_raw_rows(self):
+        response = self.get(layout="wide")
+        assert [row["temperature"] for row in response.data] == [30.0, 20.0, 10.0]
+
+    def test_columnar_layout(self):
+        Measurement.objects.create(
+            station=self.station,
+            measurement_type="humidity",
+            value=50.0,
+            recorded_at=self.hour + timedelta(seconds=1.5),
+        )
+        epoch = int(self.hour.timestamp())
+        response = self.get(layout="columnar")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "humidity": {"t": [epoch + 1.5], "v": [50.0]},
+            "temperature": {
+                "t": [epoch, epoch + 1200, epoch + 2400],
+                "v": [10.0, 20.0, 30.0],
+            },
+        }
+
+        response = self.get(interval="1h", agg="avg", layout="columnar")
+        assert response.json() == {
+            "humidity": {"t": [epoch], "v": [50.0]},
+            "temperature": {"t": [epoch], "v": [20.0]},
+        }
+
+    def test_wide_export_matches_station_csv_layout(self):
+        response = self.client.get(
+            reverse("measurement-export"),
+            {
+                "station_id": self.station.station_id,
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-02T00:00:00Z",
+                "layout": "wide",
+            },
+        )
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        assert lines[0] == (
+            "Timestamp,DeviceID,max_wind_speed,mean_wind_speed,pluviometer,"
+            "atmospheric,temperature,humidity,wind_direction,humidity_solo"
+        )
+        assert len(lines) == 4
+        timestamp = int((self.hour + timedelta(minutes=40)).timestamp())
+        assert lines[1] == f"{timestamp},{self.station.station_id},,,,,30.0,,,"
+
+    def test_invalid_interval_returns_400(self):
+        response = self.get(interval="7s")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestStationComparison:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user):
+        api_client.force_authenticate(user=regular_user)
+        self.client = api_client
+        self.hour = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+        for station_id, values in [("cmp-a", [10.0, 20.0]), ("cmp-b", [30.0])]:
+            station = Station.objects.create(station_id=station_id, name=station_id)
+            for minute, value in zip([0, 30], values):
+                Measurement.objects.create(
+                    station=station,
+                    measurement_type="temperature",
+                    value=value,
+                    recorded_at=self.hour + timedelta(minutes=minute),
+                )
+            Measurement.objects.create(
+                station=station,
+                measurement_type="humidity",
+                value=99.0,
+                recorded_at=self.hour,
+            )
+
+    def get(self, **params):
+        params = {
+            "station_id": ["cmp-a", "cmp-b"],
+            "type": "temperature",
+            "start": "2024-01-01T00:00:00Z",
+            "end": "2024-01-02T00:00:00Z",
+            **params,
+        }
+        return self.client.get(reverse("measurement-compare"), params)
+
+    def test_raw_series_aligned_on_timestamps(self):
+        response = self.get()
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == [
+            {
+                "recorded_at": self.hour + timedelta(minutes=30),
+                "cmp-a": 20.0,
+                "cmp-b": None,
+            },
+            {"recorded_at": self.hour, "cmp-a": 10.0, "cmp-b": 30.0},
+        ]
+
+    def test_bucketed_series(self):
+        response = self.get(station_id="cmp-a,cmp-b", interval="1h", agg="avg")
+        assert response.data == [
+            {"recorded_at": self.hour, "cmp-a": 15.0, "cmp-b": 30.0}
+        ]
+
+    def test_long_range_uses_rollups(self):
+        refresh_rollups("cmp-a", self.hour, self.hour + timedelta(hours=1))
+        refresh_rollups("cmp-b", self.hour, self.hour + timedelta(hours=1))
+        Measurement.objects.all().delete()  # Only the rollups remain.
+        response = self.get(start="2023-06-01T00:00:00Z", interval="1d", agg="max")
+        assert response.data == [
+            {"recorded_at": self.hour.replace(hour=0), "cmp-a": 20.0, "cmp-b": 30.0}
+        ]
+
+    def test_requires_type_and_range(self):
+        assert self.get(type="").status_code == status.HTTP_400_BAD_REQUEST
+        assert self.get(end="").status_code == status.HTTP_400_BAD_REQUEST
+        assert self.get(interval="7s").status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestMeasurementTypeFilter:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user, active_station):
+        api_client.force_authenticate(user=regular_user)
+        self.client = api_client
+        self.station = active_station
+        self.hour = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+        for m_type, value in [
+            ("temperature", 20.0),
+            ("humidity", 60.0),
+            ("atmospheric", 1010.0),
+        ]:
+            Measurement.objects.create(
+                station=active_station,
+                measurement_type=m_type,
+                value=value,
+                recorded_at=self.hour,
+            )
+
+    def get(self, url_name="measurement-list", **params):
+        params = {
+            "station_id": self.station.station_id,
+            "start": "2024-01-01T00:00:00Z",
+            "end": "2024-01-02T00:00:00Z",
+            **params,
+        }
+        return self.client.get(reverse(url_name), params)
+
+    def test_types_filter_in_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(types="temperature,humidity")
+        assert sorted(row["measurement_type"] for row in response.data) == [
+            "humidity",
+            "temperature",
+        ]
+        assert any('"measurement_type" IN' in q["sql"] for q in queries)
+
+    def test_fields_projection(self):
+        response = self.get(types="temperature", fields="value,recorded_at")
+        assert response.data == [{"value": 20.0, "recorded_at": "2024-01-01T10:00:00Z"}]
+
+        response = self.get(types="humidity", fields="value", interval="1h")
+        assert response.data == [{"value": 60.0}]
+
+    def test_wide_layout_limited_to_types(self):
+        response = self.get(types="humidity,temperature", layout="wide")
+        assert response.data == [
+            {"recorded_at": self.hour, "temperature": 20.0, "humidity": 60.0}
+        ]
+
+    def test_export_with_types_and_fields(self):
+        response = self.get(
+            "measurement-export", types="atmospheric", fields="value,measurement_type"
+        )
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        assert lines == ["value,measurement_type", "1010.0,atmospheric"]
+
+    def test_unknown_field_returns_400(self):
+        response = self.get(fields="value,station")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestFastMeasurementRendering:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user, active_station):
+        api_client.force_authenticate(user=regular_user)
+        self.client = api_client
+        self.station = active_station
+        hour = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+        for i, (m_type, value) in enumerate(
+            [
+                ("temperature", 21.5),
+                ("temperature", -0.0),
+                ("humidity", 1.0 / 3),
+                ("dew\u2029point", 123456789.123),
+                ("probe\u2028é", 1e-7),
+                ("probe\u2028é", 2.5e20),
+            ]
+        ):
+            Measurement.objects.create(
+                station=active_station,
+                measurement_type=m_type,
+                value=value,
+                recorded_at=hour + timedelta(minutes=i, microseconds=i * 1001),
+            )
+
+    def assert_matches_serializer(self, **params):
+        params = {
+            "station_id": self.station.station_id,
+            "start": "2024-01-01T00:00:00Z",
+            "end": "2024-01-02T00:00:00Z",
+            **params,
+        }
+        response = self.client.get(reverse("measurement-list"), params)
+        assert response.status_code == status.HTTP_200_OK
+
+        queryset = Measurement.objects.filter(station=self.station)
+        if "types" in params:
+            queryset = queryset.filter(measurement_type__in=params["types"].split(","))
+        fields = params.get("fields", "").split(",") if "fields" in params else None
+        expected = MeasurementSerializer(queryset, many=True, fields=fields).data
+        if "page_size" in params:
+            expected = {"next": None, "results": expected}
+        assert response.content == JSONRenderer().render(expected)
+
+    def test_plain_values_encoded_by_orjson(self):
+        rows = MeasurementRows(
+            Measurement.objects.filter(
+                measurement_type__in=["temperature", "humidity", "dew\u2029point"]
+            ).values_list("measurement_type", "value", "recorded_at"),
+            MeasurementSerializer.Meta.fields,
+        )
+        assert rows.plain_dicts() is not None
+        self.assert_matches_serializer(types="temperature,humidity,dew\u2029point")
+        self.assert_matches_serializer(types="humidity", fields="recorded_at,value")
+        self.assert_matches_serializer(types="temperature,humidity", page_size=10)
+
+    def test_exponent_values_fall_back_to_stdlib(self):
+        rows = MeasurementRows(
+            Measurement.objects.values_list("measurement_type", "value", "recorded_at"),
+            MeasurementSerializer.Meta.fields,
+        )
+        assert rows.plain_dicts() is None
+        self.assert_matches_serializer()
+        self.assert_matches_serializer(fields="measurement_type", page_size=10)
+
+
+class TestMeasurementPagination:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user, active_station):
+        api_client.force_authenticate(user=regular_user)
+        self.client = api_client
+        self.station = active_station
+        self.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        # Two readings per timestamp so pages split inside a timestamp.
+        for minute in range(5):
+            for m_type in ["temperature", "humidity"]:
+                Measurement.objects.create(
+                    station=self.station,
+                    measurement_type=m_type,
+                    value=minute,
+                    recorded_at=self.start + timedelta(minutes=minute),
+                )
+
+    def test_cursor_pages_cover_every_row_once(self):
+        url = reverse("measurement-list")
+        params = {
+            "station_id": self.station.station_id,
+            "start": "2024-01-01T00:00:00Z",
+            "end": "2024-01-02T00:00:00Z",
+            "page_size": 3,
+        }
+        response = self.client.get(url, params)
+        seen = []
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            seen += [
+                (row["recorded_at"], row["measurement_type"])
+                for row in response.data["results"]
+            ]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        assert len(seen) == 10
+        assert len(set(seen)) == 10
+        assert [value for value, _ in seen] == sorted(
+            [value for value, _ in seen], reverse=True
+        )
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(
+            reverse("measurement-list"),
+            {
+                "station_id": self.station.station_id,
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-02T00:00:00Z",
+                "cursor": "not-a-cursor",
+            },
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
 
 class TestDataIngestionView:
     def test_ingestion_creates_station_and_measurements(self, api_client):
@@ -203,9 +660,1044 @@ class TestDataIngestionView:
         assert active_station.measurements.count() == 1
         assert active_station.measurements.first().measurement_type == "wind_speed"
 
+    def test_ingestion_reports_accepted_and_rejected(self, api_client):
+        url = reverse("iot-data-ingestion")
+        timestamp = int(datetime.now(timezone.utc).timestamp())
+        data = {
+            "station_id": "batch-device-01",
+            "measurements": [
+                {"type": "temperature", "value": 22.3, "recorded_at": timestamp},
+                {"type": "humidity", "value": "not-a-number", "recorded_at": timestamp},
+                {"type": "pressure", "value": 1012, "recorded_at": timestamp + 60},
+            ],
+        }
+        response = api_client.post(url, data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["accepted"] == 2
+        assert response.data["rejected"] == 1
+        assert response.data["errors"][0]["index"] == 1
+        assert Measurement.objects.count() == 2
+
+    def test_out_of_range_timestamps_are_rejected(self, api_client):
+        timestamp = int(datetime.now(timezone.utc).timestamp())
+        data = {
+            "station_id": "batch-device-01",
+            "measurements": [
+                {"type": "temperature", "value": 22.3, "recorded_at": timestamp},
+                {"type": "temperature", "value": 22.3, "recorded_at": 10**13},
+                {"type": "humidity", "value": 50.0, "recorded_at": -(10**12)},
+            ],
+        }
+        response = api_client.post(reverse("iot-data-ingestion"), data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["accepted"] == 1
+        assert [e["index"] for e in response.data["errors"]] == [1, 2]
+        assert Measurement.objects.count() == 1
+
+    def test_edge_timestamps_keep_station_writable(self, api_client):
+        url = reverse("iot-data-ingestion")
+        for station_id, edge, outside in [
+            ("early-device-01", 0, -1),
+            ("late-device-01", 4102444800, 4102444801),
+        ]:
+            data = {
+                "station_id": station_id,
+                "measurements": [
+                    {"type": "temperature", "value": 1.0, "recorded_at": edge},
+                    {"type": "humidity", "value": 1.0, "recorded_at": outside},
+                ],
+            }
+            response = api_client.post(url, data, format="json")
+            assert response.status_code == status.HTTP_201_CREATED
+            assert response.data["accepted"] == 1
+            # Later uploads to the station still go through.
+            data["measurements"] = [
+                {"type": "temperature", "value": 2.0, "recorded_at": 1704067200}
+            ]
+            response = api_client.post(url, data, format="json")
+            assert response.status_code == status.HTTP_201_CREATED
+        assert Measurement.objects.count() == 4
+
+    def test_replayed_upload_does_not_duplicate(self, api_client):
+        url = reverse("iot-data-ingestion")
+        timestamp = int(datetime.now(timezone.utc).timestamp())
+        data = {
+            "station_id": "retry-device-01",
+            "measurements": [
+                {"type": "temperature", "value": 22.3, "recorded_at": timestamp},
+                {"type": "humidity", "value": 55.0, "recorded_at": timestamp},
+            ],
+        }
+        api_client.post(url, data, format="json")
+        response = api_client.post(url, data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Measurement.objects.count() == 2
+
     def test_ingestion_handles_bad_request(self, api_client):
         url = reverse("iot-data-ingestion")
         data = {"measurements": []}  # Missing station_id
         response = api_client.post(url, data, format="json")
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert "station_id" in response.data["error"]
+
+    def test_columnar_json_upload(self, api_client):
+        url = reverse("iot-data-ingestion")
+        timestamp = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+        data = {
+            "station_id": "columnar-device-01",
+            "timestamps": [timestamp, timestamp + 60],
+            "values": {"temperature": [20.5, 21.0], "humidity": [None, 55.0]},
+        }
+        response = api_client.post(url, data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["accepted"] == 3
+        assert Measurement.objects.filter(measurement_type="humidity").count() == 1
+
+    def test_packed_binary_upload(self, api_client):
+        url = reverse("iot-data-ingestion")
+        timestamp = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+        body = pack_readings(
+            "packed-device-01",
+            [timestamp, timestamp + 60],
+            {"temperature": [21.3, float("nan")], "atmospheric": [1012.0, 1013.0]},
+            location="Packed Location",
+        )
+        response = api_client.post(
+            url, body, content_type=PackedReadingsParser.media_type
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["accepted"] == 3
+        station = Station.objects.get(station_id="packed-device-01")
+        assert station.location == "Packed Location"
+        reading = station.measurements.get(measurement_type="temperature")
+        # Sent as float64 by default, so stored exactly like a JSON upload.
+        assert reading.value == 21.3
+        assert reading.recorded_at == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_columnar_upload_rejects_misaligned_arrays(self, api_client):
+        url = reverse("iot-data-ingestion")
+        data = {
+            "station_id": "columnar-device-01",
+            "timestamps": [1704067200, 1704067260],
+            "values": {"temperature": [20.5]},
+        }
+        response = api_client.post(url, data, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Measurement.objects.count() == 0
+
+    def test_columnar_upload_rejects_out_of_range_timestamps(self, api_client):
+        url = reverse("iot-data-ingestion")
+        for timestamps in ([1704067200, 10**19], [1704067200, 10**13]):
+            data = {
+                "station_id": "columnar-device-01",
+                "timestamps": timestamps,
+                "values": {"temperature": [20.5, 21.0]},
+            }
+            response = api_client.post(url, data, format="json")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        body = pack_readings("packed-device-01", [-(10**15)], {"temperature": [1.0]})
+        response = api_client.post(
+            url, body, content_type=PackedReadingsParser.media_type
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Measurement.objects.count() == 0
+
+    def test_truncated_packed_body_is_rejected(self, api_client):
+        body = pack_readings("packed-device-01", [1704067200], {"temperature": [1.0]})
+        response = api_client.post(
+            reverse("iot-data-ingestion"),
+            body[:-2],
+            content_type=PackedReadingsParser.media_type,
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_packed_types_must_be_strings(self, api_client):
+        body = pack_readings("packed-device-01", [1704067200], {1: [1.0]})
+        text = pack_readings("packed-device-01", [1704067200], {"temp": [1.0]})
+        # Same length, so only the header check can reject it.
+        text = text.replace(b'"types": ["temp"]', b'"types": "temp"  ')
+        for body in [body, text]:
+            response = api_client.post(
+                reverse("iot-data-ingestion"),
+                body,
+                content_type=PackedReadingsParser.media_type,
+            )
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Measurement.objects.count() == 0
+
+
+class TestMeasurementRollups:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, active_station):
+        self.client = api_client
+        self.station = active_station
+        self.hour = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+        self.client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": self.station.station_id,
+                "measurements": [
+                    {
+                        "type": "temperature",
+                        "value": value,
+                        "recorded_at": int(self.hour.timestamp()) + offset,
+                    }
+                    for offset, value in [(0, 10.0), (600, 20.0), (3600, 60.0)]
+                ],
+            },
+            format="json",
+        )
+
+    def test_ingestion_updates_rollups(self):
+        hourly = MeasurementHourly.objects.get(bucket=self.hour)
+        assert hourly.reading_count == 2
+        assert hourly.avg_value == 15.0
+        daily = MeasurementDaily.objects.get()
+        assert daily.reading_count == 3
+        assert daily.min_value == 10.0
+        assert daily.max_value == 60.0
+        assert daily.avg_value == 30.0
+
+    def test_rebuild_command_recomputes_rollups(self):
+        Measurement.objects.filter(value=60.0).delete()
+        call_command("rebuild_rollups", stdout=StringIO())
+        assert MeasurementHourly.objects.count() == 1
+        assert MeasurementDaily.objects.get().reading_count == 2
+
+    def test_long_range_reads_rollups(self, regular_user):
+        self.client.force_authenticate(user=regular_user)
+        # Rollups are the source for long ranges, so a stale value shows up.
+        MeasurementDaily.objects.update(sum_value=300.0)
+        response = self.client.get(
+            reverse("measurement-list"),
+            {
+                "station_id": self.station.station_id,
+                "start": "2023-01-01T00:00:00Z",
+                "end": "2024-12-31T00:00:00Z",
+            },
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        assert response.data[0]["value"] == 100.0
+        assert response.data[0]["recorded_at"] == datetime(
+            2024, 1, 1, tzinfo=timezone.utc
+        )
+
+    def test_refresh_covers_touched_hours_only(self, monkeypatch):
+        refreshed = []
+        monkeypatch.setattr(
+            rollups,
+            "refresh_rollups",
+            lambda station_id, start, end: refreshed.append((start, end)),
+        )
+        old = datetime(2020, 6, 1, 12, 30, tzinfo=timezone.utc)
+        rollups.refresh_rollups_for(
+            [
+                ("s", self.hour),
+                ("s", old),
+                ("s", self.hour + timedelta(hours=5)),
+            ]
+        )
+        assert refreshed == [(old, old), (self.hour, self.hour + timedelta(hours=5))]
+
+
+class TestStationDataAvailability:
+    def ingest(self, api_client, station_id, readings):
+        api_client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": station_id,
+                "measurements": [
+                    {"type": m_type, "value": 1.0, "recorded_at": int(dt.timestamp())}
+                    for m_type, dt in readings
+                ],
+            },
+            format="json",
+        )
+
+    def url(self, station_id):
+        return reverse("station-data-availability", kwargs={"station_id": station_id})
+
+    def test_availability_is_maintained_by_ingestion(self, api_client, regular_user):
+        first = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.ingest(
+            api_client,
+            "summary-device-01",
+            [("temperature", first), ("humidity", first + timedelta(hours=1))],
+        )
+        self.ingest(
+            api_client,
+            "summary-device-01",
+            [("temperature", first + timedelta(days=2))],
+        )
+
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(self.url("summary-device-01"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["min_date"] == first
+        assert response.data["max_date"] == first + timedelta(days=2)
+        assert response.data["measurement_counts"] == {
+            "temperature": 2,
+            "humidity": 1,
+        }
+
+    def test_conditional_request_returns_not_modified(self, api_client, regular_user):
+        first = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.ingest(api_client, "summary-device-01", [("temperature", first)])
+
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(self.url("summary-device-01"))
+        etag = response["ETag"]
+        assert response["Last-Modified"]
+
+        response = api_client.get(
+            self.url("summary-device-01"), headers={"If-None-Match": etag}
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        self.ingest(
+            api_client, "summary-device-01", [("temperature", first + timedelta(1))]
+        )
+        response = api_client.get(
+            self.url("summary-device-01"), headers={"If-None-Match": etag}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_rollup_backfill_keeps_counts(self, api_client):
+        first = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.ingest(
+            api_client,
+            "summary-device-01",
+            [("temperature", first + timedelta(hours=h)) for h in range(3)],
+        )
+        backfill_rollups = importlib.import_module(
+            "stations.migrations.0005_measurement_rollups"
+        ).backfill_rollups
+        # The PostgreSQL statements, then the ORM fallback used elsewhere, on
+        # readings stored before the rollup tables existed.
+        for schema_connection in [connection, SimpleNamespace(vendor="sqlite")]:
+            MeasurementHourly.objects.all().delete()
+            MeasurementDaily.objects.all().delete()
+            backfill_rollups(django_apps, SimpleNamespace(connection=schema_connection))
+            assert MeasurementHourly.objects.count() == 3
+            assert MeasurementDaily.objects.aggregate(n=Sum("reading_count"))["n"] == 3
+
+        # Later uploads re-sum the summary count from complete rollups.
+        self.ingest(
+            api_client,
+            "summary-device-01",
+            [("temperature", first + timedelta(days=2))],
+        )
+        assert MeasurementSummary.objects.get().reading_count == 4
+
+    def test_station_without_data(self, api_client, regular_user, active_station):
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(self.url(active_station.station_id))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_rebuild_shrinks_range_after_deletes(self, api_client, regular_user):
+        first = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.ingest(
+            api_client,
+            "summary-device-01",
+            [("temperature", first), ("temperature", first + timedelta(days=1))],
+        )
+        Measurement.objects.filter(recorded_at=first).delete()
+        call_command(
+            "rebuild_rollups", "--station", "summary-device-01", stdout=StringIO()
+        )
+
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(self.url("summary-device-01"))
+        assert response.data["min_date"] == first + timedelta(days=1)
+        assert response.data["measurement_counts"] == {"temperature": 1}
+
+
+class TestLatestConditions:
+    def ingest(self, api_client, station_id, m_type, value, dt):
+        api_client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": station_id,
+                "measurements": [
+                    {"type": m_type, "value": value, "recorded_at": int(dt.timestamp())}
+                ],
+            },
+            format="json",
+        )
+
+    def test_latest_reading_per_type(
+        self, api_client, regular_user, active_station, inactive_station
+    ):
+        now = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        self.ingest(api_client, active_station.station_id, "temperature", 18.0, now)
+        # A late upload of an older reading does not replace the latest one.
+        self.ingest(
+            api_client,
+            active_station.station_id,
+            "temperature",
+            11.0,
+            now - timedelta(hours=1),
+        )
+        self.ingest(api_client, active_station.station_id, "humidity", 70.0, now)
+        self.ingest(api_client, inactive_station.station_id, "temperature", 5.0, now)
+
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(reverse("station-latest"))
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+        readings = response.data[0]["readings"]
+        assert response.data[0]["station_id"] == active_station.station_id
+        assert readings["temperature"] == {"value": 18.0, "recorded_at": now}
+        assert readings["humidity"]["value"] == 70.0
+
+    def test_non_finite_values_are_rejected(
+        self, api_client, regular_user, active_station
+    ):
+        now = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+        self.ingest(api_client, active_station.station_id, "temperature", 18.0, now)
+        url = reverse("iot-data-ingestion")
+        timestamp = int(now.timestamp())
+        # 1e999 is valid JSON and parses to infinity.
+        response = api_client.post(
+            url,
+            f'{{"station_id": "{active_station.station_id}", "measurements": '
+            f'[{{"type": "humidity", "value": 1e999, "recorded_at": {timestamp}}}]}}',
+            content_type="application/json",
+        )
+        assert response.data["accepted"] == 0
+        response = api_client.post(
+            url,
+            f'{{"station_id": "{active_station.station_id}", '
+            f'"timestamps": [{timestamp}], "values": {{"humidity": [-1e999]}}}}',
+            content_type="application/json",
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        body = pack_readings(
+            active_station.station_id, [timestamp], {"humidity": [float("inf")]}
+        )
+        response = api_client.post(
+            url, body, content_type=PackedReadingsParser.media_type
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        api_client.force_authenticate(user=regular_user)
+        response = api_client.get(reverse("station-latest"))
+        assert response.status_code == status.HTTP_200_OK
+        assert list(response.data[0]["readings"]) == ["temperature"]
+
+    def test_unauthenticated_user_cannot_access(self, api_client):
+        response = api_client.get(reverse("station-latest"))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TestMeasurementHttpCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user):
+        self.client = api_client
+        self.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.ingest([self.start + timedelta(hours=h) for h in range(48)])
+        api_client.force_authenticate(user=regular_user)
+
+    def ingest(self, times):
+        self.client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": "cache-device-01",
+                "measurements": [
+                    {
+                        "type": "temperature",
+                        "value": 1.0,
+                        "recorded_at": int(t.timestamp()),
+                    }
+                    for t in times
+                ],
+            },
+            format="json",
+        )
+
+    def get(self, end, url_name="measurement-list", **headers):
+        params = {
+            "station_id": "cache-device-01",
+            "start": self.start.isoformat(),
+            "end": end.isoformat(),
+        }
+        return self.client.get(reverse(url_name), params, **headers)
+
+    def test_historical_range_is_revalidated(self):
+        end = self.start + timedelta(hours=12)
+        response = self.get(end)
+        assert response.status_code == status.HTTP_200_OK
+        # Not immutable: clients must revalidate to see history changes.
+        assert response["Cache-Control"] == "private, max-age=600"
+        etag = response["ETag"]
+        assert not etag.startswith("W/")
+
+        # New readings do not change a range that ended before the watermark.
+        self.ingest([self.start + timedelta(days=3)])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(end, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert not any('"stations_measurement"' in q["sql"] for q in queries)
+
+        response = self.get(end, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT="text/csv")
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_late_reading_invalidates_historical_range(self):
+        end = self.start + timedelta(hours=12)
+        etag = self.get(end)["ETag"]
+        self.ingest([self.start + timedelta(hours=5, minutes=30)])
+        response = self.get(end, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert len(response.data) == 14
+        assert self.get(end, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+    def test_rebuild_invalidates_historical_range(self):
+        end = self.start + timedelta(hours=12)
+        etag = self.get(end)["ETag"]
+        Measurement.objects.filter(recorded_at=self.start).delete()
+        rollups.rebuild_summary("cache-device-01")
+        response = self.get(end, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 12
+
+    def test_live_range_revalidates_after_ingestion(self):
+        end = self.start + timedelta(days=7)
+        response = self.get(end)
+        assert response["Cache-Control"] == "private, max-age=60"
+        etag = response["ETag"]
+        assert self.get(end, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        self.ingest([self.start + timedelta(days=3)])
+        response = self.get(end, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_export_is_cached(self):
+        end = self.start + timedelta(hours=12)
+        response = self.get(end, url_name="measurement-export")
+        etag = response["ETag"]
+        assert response["Cache-Control"] == "private, max-age=600"
+        response = self.get(end, url_name="measurement-export", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+class TestStationStats:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, regular_user, settings, tmp_path):
+        settings.MEASUREMENT_ARCHIVE_DIR = str(tmp_path / "archive")
+        api_client.force_authenticate(user=regular_user)
+        self.client = api_client
+        self.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.ingest([("temperature", float(v), v) for v in range(1, 11)])
+        self.ingest([("humidity", 50.0, 0)])
+
+    def ingest(self, readings):
+        self.client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": "stats-device-01",
+                "measurements": [
+                    {
+                        "type": t,
+                        "value": v,
+                        "recorded_at": int(self.start.timestamp()) + minute * 60,
+                    }
+                    for t, v, minute in readings
+                ],
+            },
+            format="json",
+        )
+
+    def get(self, **params):
+        return self.client.get(
+            reverse("station-stats", kwargs={"station_id": "stats-device-01"}),
+            {"start": "2024-01-01T00:00:00Z", "end": "2024-01-02T00:00:00Z", **params},
+        )
+
+    def test_stats_per_type(self):
+        response = self.get()
+        assert response.status_code == status.HTTP_200_OK
+        humidity, temperature = response.data["stats"]
+        assert humidity["count"] == 1
+        assert humidity["stddev"] is None
+        assert temperature["count"] == 10
+        assert (temperature["min"], temperature["max"]) == (1.0, 10.0)
+        assert temperature["mean"] == 5.5
+        assert temperature["stddev"] == pytest.approx(3.02765, rel=1e-5)
+        assert temperature["percentiles"]["p50"] == 5.5
+        assert temperature["percentiles"]["p95"] == pytest.approx(9.55)
+
+    def test_sql_and_numpy_agree(self):
+        readings = Measurement.objects.values_list("measurement_type", "value")
+        expected = _numpy_stats(list(readings), [10, 50, 90])
+        response = self.get(percentiles="10,50,90")
+        for sql_row, numpy_row in zip(response.data["stats"], expected):
+            assert sql_row["percentiles"] == pytest.approx(numpy_row["percentiles"])
+            assert sql_row["mean"] == pytest.approx(numpy_row["mean"])
+
+    def test_type_filter_and_validation(self):
+        response = self.get(type="humidity")
+        assert [row["measurement_type"] for row in response.data["stats"]] == [
+            "humidity"
+        ]
+        assert self.get(percentiles="50,120").status_code == 400
+        assert self.get(start="").status_code == 400
+
+    def test_cached_until_new_readings(self):
+        self.get(type="temperature")
+        with CaptureQueriesContext(connection) as queries:
+            self.get(type="temperature")
+        assert not any('stations_measurement"' in q["sql"] for q in queries)
+
+        self.ingest([("temperature", 100.0, 11)])
+        response = self.get(type="temperature")
+        assert response.data["stats"][0]["max"] == 100.0
+
+    def test_includes_archived_months(self):
+        call_command("archive_measurements", "--days", "30", stdout=StringIO())
+        assert Measurement.objects.count() == 0
+        response = self.get(type="temperature")
+        assert response.data["stats"][0]["count"] == 10
+        assert response.data["stats"][0]["percentiles"]["p50"] == 5.5
+
+    def test_naive_range_with_archived_months(self):
+        call_command("archive_measurements", "--days", "30", stdout=StringIO())
+        response = self.get(
+            type="temperature", start="2024-01-01T00:00:00", end="2024-01-02T00:00:00"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["stats"][0]["count"] == 10
+
+
+class TestStationCache:
+    def payload(self, station_id, offset=0):
+        timestamp = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+        return {
+            "station_id": station_id,
+            "measurements": [
+                {
+                    "type": "temperature",
+                    "value": 20.0,
+                    "recorded_at": timestamp + offset,
+                }
+            ],
+        }
+
+    def test_known_station_skips_lookup(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        url = reverse("iot-data-ingestion")
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.post(url, self.payload("cached-device-01"), format="json")
+        assert station_cache.is_known("cached-device-01")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(
+                url, self.payload("cached-device-01", offset=60), format="json"
+            )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert not any('FROM "stations_station"' in q["sql"] for q in queries)
+        assert Measurement.objects.count() == 2
+
+    def test_station_delete_invalidates_cache(
+        self, api_client, admin_user, active_station, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            station_cache.ensure_station(active_station.station_id)
+        assert station_cache.is_known(active_station.station_id)
+
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.delete(
+            reverse("station-detail", kwargs={"pk": active_station.pk})
+        )
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not station_cache.is_known(active_station.station_id)
+
+        # The next upload recreates the station instead of failing.
+        api_client.post(
+            reverse("iot-data-ingestion"),
+            self.payload(active_station.station_id),
+            format="json",
+        )
+        assert Station.objects.filter(station_id=active_station.station_id).exists()
+
+
+class TestCompressedIngestion:
+    def payload(self, count=2):
+        timestamp = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+        return {
+            "station_id": "gzip-device-01",
+            "measurements": [
+                {"type": "temperature", "value": 20.0, "recorded_at": timestamp + i}
+                for i in range(count)
+            ],
+        }
+
+    def post(self, api_client, body, encoding):
+        return api_client.post(
+            reverse("iot-data-ingestion"),
+            body,
+            content_type="application/json",
+            headers={"Content-Encoding": encoding},
+        )
+
+    def test_gzip_body_is_decompressed(self, api_client):
+        body = gzip.compress(json.dumps(self.payload()).encode())
+        response = self.post(api_client, body, "gzip")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Measurement.objects.count() == 2
+
+    def test_zstd_body_is_decompressed(self, api_client):
+        body = zstandard.ZstdCompressor().compress(json.dumps(self.payload()).encode())
+        response = self.post(api_client, body, "zstd")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Measurement.objects.count() == 2
+
+    def test_oversized_body_is_rejected(self, api_client, settings):
+        settings.INGESTION_MAX_BODY_SIZE = 1024
+        body = gzip.compress(json.dumps(self.payload(count=100)).encode())
+        assert len(body) < 1024
+        response = self.post(api_client, body, "gzip")
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert Measurement.objects.count() == 0
+
+    def test_corrupt_body_is_rejected(self, api_client):
+        response = self.post(api_client, b"not gzip", "gzip")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unknown_encoding_is_rejected(self, api_client):
+        response = self.post(api_client, b"{}", "br")
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+class TestIngestionQueue:
+    @pytest.fixture(autouse=True)
+    def queue_mode(self, settings, tmp_path):
+        settings.INGESTION_MODE = "queue"
+        settings.INGESTION_SPOOL_DIR = str(tmp_path / "spool")
+
+    def post(self, api_client, station_id, values):
+        timestamp = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+        return api_client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": station_id,
+                "location": "Queued Location",
+                "measurements": [
+                    {
+                        "type": "temperature",
+                        "value": value,
+                        "recorded_at": timestamp + i,
+                    }
+                    for i, value in enumerate(values)
+                ],
+            },
+            format="json",
+        )
+
+    def test_upload_is_queued_without_writing(self, api_client):
+        response = self.post(api_client, "queued-device-01", [20.0, 21.0])
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data["accepted"] == 2
+        assert not Station.objects.exists()
+        assert Measurement.objects.count() == 0
+
+    def test_worker_drains_queue(self, api_client, admin_user):
+        self.post(api_client, "queued-device-01", [20.0, 21.0])
+        self.post(api_client, "queued-device-02", [22.0])
+        call_command("process_ingestion_queue", "--once", stdout=StringIO())
+
+        assert Measurement.objects.count() == 3
+        assert Station.objects.get(station_id="queued-device-01").location == (
+            "Queued Location"
+        )
+
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.get(reverse("iot-data-queue-stats"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["pending_batches"] == 0
+        assert response.data["worker"]["processed_readings"] == 3
+
+    def test_stats_are_summed_across_processes(self, api_client, admin_user):
+        spool = Path(settings.INGESTION_SPOOL_DIR)
+        spool.mkdir(parents=True)
+        # Left by another web process and another worker.
+        (spool / "enqueue-1-abc.stats").write_text(
+            json.dumps({"enqueued_batches": 5, "enqueued_readings": 50})
+        )
+        (spool / "worker-1-abc.stats").write_text(
+            json.dumps(
+                {
+                    "processed_batches": 4,
+                    "processed_readings": 40,
+                    "last_batch_at": "2024-01-01T00:00:00+00:00",
+                    "last_batch_readings": 10,
+                    "last_batch_rows_per_second": 100,
+                }
+            )
+        )
+        self.post(api_client, "queued-device-01", [20.0, 21.0])
+        self.post(api_client, "queued-device-02", [22.0])
+        call_command("process_ingestion_queue", "--once", stdout=StringIO())
+
+        api_client.force_authenticate(user=admin_user)
+        stats = api_client.get(reverse("iot-data-queue-stats")).data
+        assert (stats["enqueued_batches"], stats["enqueued_readings"]) == (7, 53)
+        assert stats["worker"]["processed_batches"] == 6
+        assert stats["worker"]["processed_readings"] == 43
+        assert stats["worker"]["last_batch_readings"] == 3
+
+    def test_idle_stats_files_are_merged(self, api_client, admin_user):
+        spool = Path(settings.INGESTION_SPOOL_DIR)
+        spool.mkdir(parents=True)
+        # Left by web processes that have exited.
+        idle = time.time() - 2 * STATS_MERGE_SECONDS
+        for pid, batches in [(1, 5), (2, 3)]:
+            path = spool / f"enqueue-{pid}-abc.stats"
+            path.write_text(
+                json.dumps({"enqueued_batches": batches, "enqueued_readings": 10})
+            )
+            os.utime(path, (idle, idle))
+        self.post(api_client, "queued-device-01", [20.0, 21.0])
+
+        api_client.force_authenticate(user=admin_user)
+        for _ in range(2):
+            stats = api_client.get(reverse("iot-data-queue-stats")).data
+            assert (stats["enqueued_batches"], stats["enqueued_readings"]) == (9, 22)
+        names = sorted(path.name for path in spool.glob("enqueue-*.stats"))
+        assert len(names) == 2
+        assert "enqueue-total.stats" in names
+        assert json.loads((spool / "enqueue-total.stats").read_text()) == {
+            "enqueued_batches": 8,
+            "enqueued_readings": 20,
+        }
+
+    def test_bad_upload_does_not_block_batch(self, api_client):
+        self.post(api_client, "queued-device-01", [20.0])
+        self.post(api_client, "queued-device-02", [22.0, 23.0])
+        # Written by an older version that did not bound the timestamps.
+        spool = Path(settings.INGESTION_SPOOL_DIR)
+        bad = sorted(spool.glob("*.json"))[0]
+        upload = json.loads(bad.read_text())
+        upload["readings"] = [["temperature", 1.0, 10**13]]
+        bad.write_text(json.dumps(upload))
+
+        call_command("process_ingestion_queue", "--once", stdout=StringIO())
+
+        assert Measurement.objects.count() == 2
+        assert list(spool.glob("*.processing")) == []
+        assert [p.stem for p in spool.glob("*.failed")] == [bad.stem]
+
+
+class TestManagePartitions:
+    def reading(self, station, dt):
+        return Measurement.objects.create(
+            station=station, measurement_type="temperature", value=1.0, recorded_at=dt
+        )
+
+    def test_creates_upcoming_partitions(self):
+        call_command("manage_partitions", "--months-ahead", "6", stdout=StringIO())
+        current = month_start(datetime.now(timezone.utc))
+        assert add_months(current, 6) in monthly_partitions()
+
+    def test_backfill_moves_rows_out_of_default(self, active_station):
+        old = datetime(2015, 3, 10, tzinfo=timezone.utc)
+        self.reading(active_station, old)
+        assert month_start(old) in months_in_default_partition()
+
+        call_command("manage_partitions", "--backfill", stdout=StringIO())
+        assert month_start(old) in monthly_partitions()
+        assert months_in_default_partition() == []
+        assert Measurement.objects.filter(recorded_at=old).count() == 1
+
+    def test_retention_drops_expired_partitions(
+        self, settings, tmp_path, active_station
+    ):
+        settings.MEASUREMENT_ARCHIVE_DIR = str(tmp_path)
+        old = datetime(2015, 3, 10, tzinfo=timezone.utc)
+        recent = datetime.now(timezone.utc)
+        self.reading(active_station, old)
+        self.reading(active_station, recent)
+        call_command("manage_partitions", "--backfill", stdout=StringIO())
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                "manage_partitions",
+                "--retention-months",
+                "24",
+                "--drop",
+                stdout=StringIO(),
+            )
+        # The partition is dropped, not emptied row by row.
+        assert not any(q["sql"].startswith("DELETE") for q in queries)
+        assert month_start(old) not in monthly_partitions()
+        assert list(Measurement.objects.values_list("recorded_at", flat=True)) == [
+            recent
+        ]
+        # The dropped readings are archived first.
+        assert archive_path(active_station.station_id, month_start(old)).exists()
+
+
+class TestArchiveMeasurements:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, tmp_path, api_client, regular_user):
+        settings.MEASUREMENT_ARCHIVE_DIR = str(tmp_path / "archive")
+        self.client = api_client
+        self.user = regular_user
+        self.old = datetime(2020, 1, 15, 12, tzinfo=timezone.utc)
+        self.recent = datetime.now(timezone.utc).replace(microsecond=0)
+        self.ingest(
+            [
+                ("temperature", 10.0, self.old),
+                ("humidity", 80.0, self.old),
+                ("temperature", 11.0, self.old + timedelta(minutes=1)),
+                ("temperature", 20.0, self.recent),
+            ]
+        )
+
+    def ingest(self, readings):
+        self.client.post(
+            reverse("iot-data-ingestion"),
+            {
+                "station_id": "archive-device-01",
+                "measurements": [
+                    {"type": t, "value": v, "recorded_at": int(dt.timestamp())}
+                    for t, v, dt in readings
+                ],
+            },
+            format="json",
+        )
+
+    def archive(self):
+        call_command("archive_measurements", "--days", "30", stdout=StringIO())
+
+    def export(self, **params):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(
+            reverse("measurement-export"),
+            {
+                "station_id": "archive-device-01",
+                "start": "2019-12-01T00:00:00Z",
+                "end": (self.recent + timedelta(days=1)).isoformat(),
+                **params,
+            },
+        )
+        return b"".join(response.streaming_content).decode("utf-8").splitlines()
+
+    def test_old_months_move_to_parquet(self):
+        self.archive()
+        assert list(Measurement.objects.values_list("value", flat=True)) == [20.0]
+        assert archive_path("archive-device-01", month_start(self.old)).exists()
+        # Rollups keep covering the archived month.
+        assert MeasurementHourly.objects.filter(bucket__year=2020).count() == 2
+        # Cached historical ranges of the station are invalidated.
+        assert not MeasurementSummary.objects.filter(history_changed_at=None).exists()
+
+    def test_export_reads_archived_months(self):
+        self.archive()
+        lines = self.export()
+        assert lines[1].startswith("temperature,20.0,")
+        assert lines[2:] == [
+            "temperature,11.0,2020-01-15T12:01:00Z",
+            "temperature,10.0,2020-01-15T12:00:00Z",
+            "humidity,80.0,2020-01-15T12:00:00Z",
+        ]
+
+        lines = self.export(layout="wide")
+        assert len(lines) == 4
+        timestamp = int(self.old.timestamp())
+        assert lines[3] == f"{timestamp},archive-device-01,,,,,10.0,80.0,,"
+
+    def test_late_readings_are_merged_into_archive(self):
+        self.archive()
+        self.ingest(
+            [
+                ("temperature", 10.0, self.old),
+                ("temperature", 12.0, self.old + timedelta(minutes=2)),
+            ]
+        )
+        self.archive()
+        assert Measurement.objects.count() == 1
+        assert len(self.export()) == 1 + 5
+
+    def test_late_readings_keep_archived_rollups(self):
+        self.archive()
+        # One duplicate of an archived reading, one new one.
+        self.ingest(
+            [
+                ("temperature", 10.0, self.old),
+                ("temperature", 12.0, self.old + timedelta(minutes=2)),
+            ]
+        )
+        hourly = MeasurementHourly.objects.get(
+            measurement_type="temperature", bucket=self.old
+        )
+        assert (hourly.reading_count, hourly.sum_value) == (3, 33.0)
+        summary = MeasurementSummary.objects.get(measurement_type="temperature")
+        assert summary.reading_count == 4
+
+    def test_rebuild_keeps_archived_readings(self):
+        self.archive()
+        rollups.rebuild_rollups("archive-device-01", self.old, self.recent)
+        rollups.rebuild_summary("archive-device-01")
+        hourly = MeasurementHourly.objects.get(
+            measurement_type="temperature", bucket=self.old
+        )
+        assert (hourly.reading_count, hourly.min_value) == (2, 10.0)
+        humidity = MeasurementSummary.objects.get(measurement_type="humidity")
+        assert (humidity.reading_count, humidity.last_value) == (1, 80.0)
+        temperature = MeasurementSummary.objects.get(measurement_type="temperature")
+        assert temperature.first_recorded_at == self.old
+        assert temperature.reading_count == 3
+
+
+class TestLoadStationDataCommand:
+    @pytest.fixture
+    def csv_file(self, tmp_path):
+        path = tmp_path / "stations.csv"
+        path.write_text(
+            "Timestamp,DeviceID,temperature,humidity\n"
+            "1733760360,stationGardunha,19.3,46\n"
+            "1733764260,stationGardunha,21.8,\n"
+        )
+        return path
+
+    def test_command_loads_csv(self, csv_file):
+        call_command("load_station_data", str(csv_file), stdout=StringIO())
+        assert Station.objects.filter(station_id="stationGardunha").exists()
+        assert Measurement.objects.count() == 3
+
+    def test_command_can_be_rerun_on_same_csv(self, csv_file):
+        call_command("load_station_data", str(csv_file), stdout=StringIO())
+        call_command("load_station_data", str(csv_file), stdout=StringIO())
+        assert Measurement.objects.count() == 3
+
+    @pytest.mark.django_db(transaction=True)
+    def test_command_loads_directory_in_parallel_with_checkpoint(self, tmp_path):
+        for device in ["stationA", "stationB"]:
+            (tmp_path / f"{device}.csv").write_text(
+                "Timestamp,DeviceID,temperature\n"
+                f"1733760360,{device},19.3\n"
+                f"1733764260,{device},21.8\n"
+            )
+        checkpoint = tmp_path / "done.txt"
+        call_command(
+            "load_station_data",
+            str(tmp_path),
+            workers=2,
+            checkpoint=str(checkpoint),
+            stdout=StringIO(),
+        )
+        assert Measurement.objects.count() == 4
+        assert len(checkpoint.read_text().splitlines()) == 2
+
+        out = StringIO()
+        call_command(
+            "load_station_data", str(tmp_path), checkpoint=str(checkpoint), stdout=out
+        )
+        assert "Skipping 2 file(s)" in out.getvalue()
@@ -0,0 +1,243 @@
+from datetime import datetime, timedelta, timezone
+from django.db.models import Aggregate, Avg, DateTimeField, F, FloatField, Func
+from django.db.models import Max, Min, Q, Sum, Value
+from .models import Measurement
+from .rollups import ROLLUP_MODELS
+
+# Bucket widths accepted by the `interval` query parameter.
+INTERVALS = {
+    "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "6h": timedelta(hours=6),
+    "1d": timedelta(days=1),
+}
+
+# `interval=auto` picks the smallest bucket that keeps each series under this size.
+MAX_POINTS_PER_SERIES = 1000
+
+# Ranges longer than this are answered from the hourly/daily rollups.
+ROLLUP_THRESHOLD = timedelta(days=90)
+
+# Buckets are aligned to this instant (a midnight), so "1d" buckets start at 00:00 UTC.
+BUCKET_ORIGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+class DateBin(Func):
+    """PostgreSQL date_bin(): truncates a timestamp to a fixed-width bucket."""
+
+    function = "DATE_BIN"
+    output_field = DateTimeField()
+
+    def __init__(self, interval, expression, **extra):
+        super().__init__(Value(interval), expression, Value(BUCKET_ORIGIN), **extra)
+
+
+class Last(Aggregate):
+    """Value of the most recent reading in each group."""
+
+    output_field = FloatField()
+
+    def __init__(self, expression, ordering="recorded_at", **extra):
+        super().__init__(expression, ordering, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        value, ordering = self.source_expressions
+        value_sql, value_params = compiler.compile(value)
+        ordering_sql, ordering_params = compiler.compile(ordering)
+        sql = f"ARRAY_AGG({value_sql} ORDER BY {ordering_sql} DESC)"
+        params = (*value_params, *ordering_params)
+        if self.filter is not None:
+            filter_sql, filter_params = compiler.compile(self.filter)
+            sql = f"{sql} FILTER (WHERE {filter_sql})"
+            params = (*params, *filter_params)
+        return f"({sql})[1]", params
+
+
+AGGREGATES = {
+    "avg": Avg,
+    "min": Min,
+    "max": Max,
+    "last": Last,
+}
+
+
+def pivot(queryset, time_field, columns, aggregate, column_field="measurement_type"):
+    """
+    Turns long-form rows into one row per `time_field` value with one column
+    per `column_field` value (measurement type by default), using conditional
+    aggregation in SQL.
+    `aggregate(filter)` must return the aggregate for the rows matching filter.
+    Returns (timestamp, value_1, ..., value_n) tuples, newest first.
+    """
+    # Aliases are positional so column values never clash with fields.
+    aliases = {
+        f"column_{i}": aggregate(Q(**{column_field: column}))
+        for i, column in enumerate(columns)
+    }
+    return (
+        queryset.values(time_field)
+        .annotate(**aliases)
+        .order_by(f"-{time_field}")
+        .values_list(time_field, *aliases)
+    )
+
+
+def wide_measurements(queryset, columns):
+    """Pivots raw readings into one row per timestamp (see pivot())."""
+    return pivot(
+        queryset.order_by(),
+        "recorded_at",
+        columns,
+        lambda filter: Max("value", filter=filter),
+    )
+
+
+def bucket_measurements(queryset, interval, agg, columns=None):
+    """
+    Groups a Measurement queryset into `interval` buckets per measurement type
+    and reduces each bucket with `agg`, all in SQL.
+    Returns rows shaped like MeasurementSerializer output, where `recorded_at`
+    is the start of the bucket, or pivoted rows when `columns` is given.
+    """
+    queryset = queryset.order_by().annotate(
+        bucket=DateBin(INTERVALS[interval], F("recorded_at"))
+    )
+    if columns is not None:
+        return pivot(
+            queryset,
+            "bucket",
+            columns,
+            lambda filter: AGGREGATES[agg]("value", filter=filter),
+        )
+    return (
+        queryset.values("measurement_type", "bucket")
+        .annotate(bucket_value=AGGREGATES[agg]("value"))
+        .order_by("-bucket", "measurement_type")
+        .values_list("measurement_type", "bucket_value", "bucket")
+    )
+
+
+def columnar_series(rows):
+    """
+    Regroups (measurement_type, value, recorded_at) rows into one series per
+    measurement type, {"t": [epoch seconds], "v": [values]}, oldest first.
+    Rows are expected newest first, as the queries above return them.
+    """
+    series = {}
+    for m_type, value, recorded_at in rows:
+        if m_type not in series:
+            series[m_type] = {"t": [], "v": []}
+        seconds = recorded_at.timestamp()
+        series[m_type]["t"].append(int(seconds) if seconds.is_integer() else seconds)
+        series[m_type]["v"].append(value)
+    for columns in series.values():
+        columns["t"].reverse()
+        columns["v"].reverse()
+    return {m_type: series[m_type] for m_type in sorted(series)}
+
+
+def pick_interval(start, end):
+    """Returns the smallest interval giving at most MAX_POINTS_PER_SERIES buckets."""
+    span = end - start
+    for name, width in INTERVALS.items():
+        if span / width <= MAX_POINTS_PER_SERIES:
+            return name
+    return name
+
+
+# How each aggregate is recombined from rollup columns.
+ROLLUP_AGGREGATES = {
+    "avg": lambda filter=None: (
+        Sum("sum_value", filter=filter) / Sum("reading_count", filter=filter)
+    ),
+    "min": lambda filter=None: Min("min_value", filter=filter),
+    "max": lambda filter=None: Max("max_value", filter=filter),
+}
+
+
+def rollup_model_for(interval):
+    """Returns the coarsest rollup model whose buckets evenly divide `interval`."""
+    width = INTERVALS[interval]
+    for model_width, model in reversed(ROLLUP_MODELS):
+        if width % model_width == timedelta(0):
+            return model
+    return None
+
+
+def bucket_rollups(
+    model, station_id, start, end, interval, agg, columns=None, types=None
+):
+    """
+    Same result shape as bucket_measurements(), computed from a rollup table
+    so the cost grows with the number of buckets instead of raw readings.
+    `types` optionally restricts the measurement types.
+    """
+    model_width = next(width for width, m in ROLLUP_MODELS if m is model)
+    queryset = model.objects.filter(
+        station_id=station_id, bucket__gt=start - model_width, bucket__lte=end
+    )
+    if types:
+        queryset = queryset.filter(measurement_type__in=types)
+    queryset = queryset.order_by().annotate(
+        interval_bucket=DateBin(INTERVALS[interval], F("bucket"))
+    )
+    if columns is not None:
+        return pivot(queryset, "interval_bucket", columns, ROLLUP_AGGREGATES[agg])
+    return (
+        queryset.values("measurement_type", "interval_bucket")
+        .annotate(bucket_value=ROLLUP_AGGREGATES[agg]())
+        .order_by("-interval_bucket", "measurement_type")
+        .values_list("measurement_type", "bucket_value", "interval_bucket")
+    )
+
+
+def compare_stations(station_ids, measurement_type, start, end, interval, agg, model):
+    """
+    Aligns one measurement type of several stations on a shared time axis in
+    a single query: (timestamp, value_station_1, ..., value_station_n) rows,
+    newest first. With interval "raw" rows are aligned on exact reading
+    times; otherwise on `interval` buckets reduced with `agg`, read from the
+    rollup `model` when one is given.
+    """
+    if model is not None:
+        model_width = next(width for width, m in ROLLUP_MODELS if m is model)
+        queryset = (
+            model.objects.filter(
+                station_id__in=station_ids,
+                measurement_type=measurement_type,
+                bucket__gt=start - model_width,
+                bucket__lte=end,
+            )
+            .order_by()
+            .annotate(interval_bucket=DateBin(INTERVALS[interval], F("bucket")))
+        )
+        return pivot(
+            queryset,
+            "interval_bucket",
+            station_ids,
+            ROLLUP_AGGREGATES[agg],
+            column_field="station_id",
+        )
+
+    queryset = Measurement.objects.filter(
+        station_id__in=station_ids,
+        measurement_type=measurement_type,
+        recorded_at__gte=start,
+        recorded_at__lte=end,
+    ).order_by()
+    if interval == "raw":
+        return pivot(
+            queryset,
+            "recorded_at",
+            station_ids,
+            lambda filter: Max("value", filter=filter),
+            column_field="station_id",
+        )
+    return pivot(
+        queryset.annotate(bucket=DateBin(INTERVALS[interval], F("recorded_at"))),
+        "bucket",
+        station_ids,
+        lambda filter: AGGREGATES[agg]("value", filter=filter),
+        column_field="station_id",
+    )
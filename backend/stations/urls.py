@@ -4,7 +4,9 @@ from .views import (
     StationViewSet,
     MeasurementViewSet,
     DataIngestionView,
+    IngestionQueueStatsView,
     StationDataAvailabilityView,
+    StationStatsView,
 )
 
 router = DefaultRouter()
@@ -14,9 +16,19 @@ router.register(r"measurements", MeasurementViewSet, basename="measurement")
 urlpatterns = [
     path("", include(router.urls)),
     path("iot-data/", DataIngestionView.as_view(), name="iot-data-ingestion"),
+    path(
+        "iot-data/queue/",
+        IngestionQueueStatsView.as_view(),
+        name="iot-data-queue-stats",
+    ),
     path(
         "stations/<str:station_id>/availability/",
         StationDataAvailabilityView.as_view(),
         name="station-data-availability",
     ),
+    path(
+        "stations/<str:station_id>/stats/",
+        StationStatsView.as_view(),
+        name="station-stats",
+    ),
 ]
@@ -1,20 +1,92 @@
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.renderers import JSONRenderer
-from rest_framework_csv.renderers import CSVRenderer
+from rest_framework.settings import api_settings
+import hashlib
 from datetime import datetime, timezone
-from django.db.models import Min, Max
-from .models import Station, Measurement
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .models import Station, Measurement, MeasurementSummary, MEASUREMENT_TYPES
 from .serializers import (
     StationSerializer,
     MeasurementSerializer,
-    MeasurementCreateSerializer,
+)
+from .ingestion import (
+    build_measurements,
+    columnar_readings,
+    station_readings,
+    validate_readings,
+    write_measurements,
+    write_readings,
+)
+from .parsers import PackedReadingsParser
+from .renderers import MeasurementCSVRenderer, MeasurementJSONRenderer, MeasurementRows
+from .compression import DecompressRequestMixin
+from .station_cache import ensure_station
+from .queue import enqueue, queue_stats
+from .pagination import MeasurementKeysetPagination
+from .archive import with_archived_rows, with_archived_wide_rows
+from .stats import cached_measurement_stats
+from .http_cache import cache_measurement_range
+from .export import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_HEADER,
+    WIDE_EXPORT_HEADER,
+    long_rows,
+    stream_csv,
+    wide_rows,
+)
+from .timeseries import (
+    AGGREGATES,
+    INTERVALS,
+    ROLLUP_AGGREGATES,
+    ROLLUP_THRESHOLD,
+    bucket_measurements,
+    bucket_rollups,
+    columnar_series,
+    compare_stations,
+    pick_interval,
+    rollup_model_for,
+    wide_measurements,
 )
 
 # Create your views here.
 
 
+# Response layouts of MeasurementViewSet: one row per reading, one row per
+# timestamp with a column per measurement type, or one pair of time and value
+# arrays per measurement type.
+LAYOUTS = ["long", "wide", "columnar"]
+
+# Fields that `fields=` can project MeasurementViewSet rows to.
+MEASUREMENT_FIELDS = MeasurementSerializer.Meta.fields
+
+# Upper bound on the stations of one comparison (one SQL column each).
+MAX_COMPARED_STATIONS = 20
+
+
+def parse_timestamp(value):
+    """
+    Parses an ISO 8601 `start`/`end` query parameter. Timestamps without an
+    offset are taken as UTC, so every range can be compared and subtracted.
+    """
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def pivoted_rows(rows, columns):
+    return [
+        {"recorded_at": recorded_at, **dict(zip(columns, values))}
+        for recorded_at, *values in rows
+    ]
+
+
 class StationViewSet(viewsets.ModelViewSet):
     """
     Manages stations for admin users (CRUD).
@@ -32,26 +104,72 @@ class StationViewSet(viewsets.ModelViewSet):
 
     def get_permissions(self):
         # IsAuthenticated is sufficient for GET, HEAD, OPTIONS requests
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "latest"]:
             self.permission_classes = [permissions.IsAuthenticated]
         # All other actions (create, update, delete) require IsAdminUser
         else:
             self.permission_classes = [permissions.IsAdminUser]
         return super().get_permissions()
 
+    @action(detail=False, url_path="latest")
+    def latest(self, request):
+        """
+        Current conditions: the latest reading of every measurement type of
+        each visible station, read from the MeasurementSummary rows in one
+        query.
+        """
+        summaries = (
+            MeasurementSummary.objects.filter(station__in=self.get_queryset())
+            .select_related("station")
+            .order_by("station_id", "measurement_type")
+        )
+        stations = {}
+        for summary in summaries:
+            station = stations.setdefault(
+                summary.station_id,
+                {
+                    "station_id": summary.station_id,
+                    "name": summary.station.name,
+                    "location": summary.station.location,
+                    "readings": {},
+                },
+            )
+            station["readings"][summary.measurement_type] = {
+                "value": summary.last_value,
+                "recorded_at": summary.last_recorded_at,
+            }
+        return Response(list(stations.values()))
+
 
 class MeasurementViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Allows users to read measurement data with filters.
     Can output in JSON and CSV formats.
+    Pass `interval` (e.g. 5m, 1h, 1d or auto) and `agg` (avg, min, max, last)
+    to get one downsampled point per bucket and measurement type. Ranges longer
+    than ROLLUP_THRESHOLD are downsampled from the rollup tables by default;
+    use `interval=raw` to get every reading. `layout=wide` returns one row per
+    timestamp with a column per measurement type, pivoted in SQL, and
+    `layout=columnar` one {"t": [epoch seconds], "v": [values]} series per
+    measurement type, oldest first and never paged.
+    Raw rows can be paged through with `page_size` and the opaque `cursor`
+    returned in `next` (keyset pagination on recorded_at, id).
+    Range reads carry ETag and Cache-Control headers (see stations.http_cache).
+    `types` restricts the measurement types and `fields` the returned fields
+    (both comma separated), in the query itself.
     """
 
     serializer_class = MeasurementSerializer
     permission_classes = [permissions.IsAuthenticated]
-    renderer_classes = [JSONRenderer, CSVRenderer]  # Enable JSON and CSV renderers
+    # Enable JSON and CSV renderers
+    renderer_classes = [MeasurementJSONRenderer, MeasurementCSVRenderer]
+    pagination_class = MeasurementKeysetPagination
 
-    def get_queryset(self):
-        queryset = Measurement.objects.all()
+    def get_range(self):
+        """
+        Parses the station_id, start and end query parameters.
+        Returns None if any of them is missing or invalid.
+        """
         params = self.request.query_params
 
         station_id_str = params.get("station_id")
@@ -59,95 +177,458 @@ class MeasurementViewSet(viewsets.ReadOnlyModelViewSet):
         end_date_str = params.get("end")
 
         if not station_id_str or not start_date_str or not end_date_str:
-            return queryset.none()
+            return None
 
         try:
-            start_date = datetime.fromisoformat(start_date_str.replace("Z", "+00:00"))
-            end_date = datetime.fromisoformat(end_date_str.replace("Z", "+00:00"))
+            start_date = parse_timestamp(start_date_str)
+            end_date = parse_timestamp(end_date_str)
         except (ValueError, TypeError):
+            return None
+
+        return station_id_str, start_date, end_date
+
+    def get_queryset(self):
+        queryset = Measurement.objects.all()
+
+        measurement_range = self.get_range()
+        if measurement_range is None:
             return queryset.none()
+        station_id_str, start_date, end_date = measurement_range
 
         queryset = queryset.filter(station__station_id=station_id_str)
         queryset = queryset.filter(
             recorded_at__gte=start_date, recorded_at__lte=end_date
         )
+        # Served by the (station, measurement_type, recorded_at) unique index.
+        types = self.get_types()
+        if types:
+            queryset = queryset.filter(measurement_type__in=types)
+        fields = self.get_projection()
+        if fields:
+            # recorded_at is kept for the keyset pagination cursor.
+            queryset = queryset.only(*fields, "recorded_at")
         return queryset
 
+    def get_types(self):
+        """Measurement types requested with `types` (comma separated), or None."""
+        values = self.request.query_params.getlist("types")
+        types = [t for value in values for t in value.split(",") if t]
+        return types or None
+
+    def get_projection(self):
+        """
+        Fields requested with `fields` (comma separated), or None for all.
+        Raises a 400 ValidationError for unknown fields.
+        """
+        value = self.request.query_params.get("fields")
+        if not value:
+            return None
+        fields = [f for f in value.split(",") if f]
+        unknown = set(fields) - set(MEASUREMENT_FIELDS)
+        if unknown or not fields:
+            raise ValidationError(
+                {"fields": f"fields must be among {', '.join(MEASUREMENT_FIELDS)}."}
+            )
+        return fields
+
+    def get_columns(self):
+        """Wide layout columns: the requested types, in MEASUREMENT_TYPES order."""
+        types = self.get_types()
+        if not types:
+            return MEASUREMENT_TYPES
+        return [t for t in MEASUREMENT_TYPES if t in types] + [
+            t for t in dict.fromkeys(types) if t not in MEASUREMENT_TYPES
+        ]
 
-class DataIngestionView(APIView):
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_projection())
+        return super().get_serializer(*args, **kwargs)
+
+    @cache_measurement_range
+    def list(self, request, *args, **kwargs):
+        interval = request.query_params.get("interval")
+        agg = request.query_params.get("agg", "avg")
+        layout = request.query_params.get("layout", "long")
+        if layout not in LAYOUTS:
+            return Response(
+                {"error": f"layout must be one of {', '.join(LAYOUTS)}."}, status=400
+            )
+        # Wide rows carry one column per sensor instead of one row per reading.
+        columns = self.get_columns() if layout == "wide" else None
+
+        measurement_range = self.get_range()
+        long_range = (
+            measurement_range is not None
+            and measurement_range[2] - measurement_range[1] > ROLLUP_THRESHOLD
+        )
+        if not interval:
+            # Long ranges are downsampled unless raw rows are explicitly asked for.
+            interval = "auto" if long_range else "raw"
+        if interval == "raw":
+            if columns is not None:
+                rows = wide_measurements(self.get_queryset(), columns)
+                return Response(pivoted_rows(rows, columns))
+            if layout == "columnar":
+                rows = self.get_queryset().values_list(
+                    "measurement_type", "value", "recorded_at"
+                )
+                return Response(columnar_series(rows))
+            return self.raw_list(request, *args, **kwargs)
+
+        if interval == "auto":
+            if measurement_range is None:
+                return Response([])
+            _, start_date, end_date = measurement_range
+            interval = pick_interval(start_date, end_date)
+
+        if interval not in INTERVALS or agg not in AGGREGATES:
+            return Response(
+                {
+                    "error": (
+                        f"interval must be one of {', '.join(INTERVALS)}, auto or "
+                        f"raw, and agg one of {', '.join(AGGREGATES)}."
+                    )
+                },
+                status=400,
+            )
+        if measurement_range is None:
+            return Response([])
+
+        # Downsample in SQL so the response carries one point per bucket
+        # instead of every raw reading in the range.
+        rollup_model = rollup_model_for(interval)
+        if long_range and rollup_model is not None and agg in ROLLUP_AGGREGATES:
+            station_id_str, start_date, end_date = measurement_range
+            rows = bucket_rollups(
+                rollup_model,
+                station_id_str,
+                start_date,
+                end_date,
+                interval,
+                agg,
+                columns,
+                self.get_types(),
+            )
+        else:
+            rows = bucket_measurements(self.get_queryset(), interval, agg, columns)
+
+        if columns is not None:
+            return Response(pivoted_rows(rows, columns))
+        if layout == "columnar":
+            return Response(columnar_series(rows))
+        fields = self.get_projection() or MEASUREMENT_FIELDS
+        return Response(
+            [
+                {field: row[MEASUREMENT_FIELDS.index(field)] for field in fields}
+                for row in rows
+            ]
+        )
+
+    def raw_list(self, request, *args, **kwargs):
+        """
+        Every reading of the range, optionally paged. JSON responses skip
+        MeasurementSerializer: rows are read as tuples and encoded by
+        MeasurementJSONRenderer, with the same output.
+        """
+        if not isinstance(request.accepted_renderer, MeasurementJSONRenderer):
+            return super().list(request, *args, **kwargs)
+
+        projection = self.get_projection() or MEASUREMENT_FIELDS
+        fields = [field for field in MEASUREMENT_FIELDS if field in projection]
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            rows = [tuple(getattr(m, field) for field in fields) for m in page]
+            return self.get_paginated_response(MeasurementRows(rows, fields))
+        return Response(MeasurementRows(list(queryset.values_list(*fields)), fields))
+
+    @action(detail=False, methods=["get"])
+    def compare(self, request):
+        """
+        Compares one measurement `type` across several stations (repeat
+        `station_id` or separate IDs with commas) over `start`/`end`.
+        Returns one row per timestamp or bucket with a column per station,
+        built by a single query. `interval` and `agg` work as in list().
+        """
+        params = request.query_params
+        station_ids = list(
+            dict.fromkeys(
+                station_id
+                for value in params.getlist("station_id")
+                for station_id in value.split(",")
+                if station_id
+            )
+        )
+        measurement_type = params.get("type")
+        measurement_range = self.get_range()
+        if not station_ids or not measurement_type or measurement_range is None:
+            return Response(
+                {"error": "station_id, type, start and end are required."},
+                status=400,
+            )
+        if len(station_ids) > MAX_COMPARED_STATIONS:
+            return Response(
+                {"error": f"At most {MAX_COMPARED_STATIONS} stations can be compared."},
+                status=400,
+            )
+
+        _, start_date, end_date = measurement_range
+        long_range = end_date - start_date > ROLLUP_THRESHOLD
+        interval = params.get("interval") or ("auto" if long_range else "raw")
+        agg = params.get("agg", "avg")
+        if interval == "auto":
+            interval = pick_interval(start_date, end_date)
+        if interval != "raw" and (interval not in INTERVALS or agg not in AGGREGATES):
+            return Response(
+                {
+                    "error": (
+                        f"interval must be one of {', '.join(INTERVALS)}, auto or "
+                        f"raw, and agg one of {', '.join(AGGREGATES)}."
+                    )
+                },
+                status=400,
+            )
+
+        rollup_model = None
+        if interval != "raw" and long_range and agg in ROLLUP_AGGREGATES:
+            rollup_model = rollup_model_for(interval)
+        rows = compare_stations(
+            station_ids,
+            measurement_type,
+            start_date,
+            end_date,
+            interval,
+            agg,
+            rollup_model,
+        )
+        return Response(pivoted_rows(rows, station_ids))
+
+    @action(detail=False, methods=["get"])
+    @cache_measurement_range
+    def export(self, request):
+        """
+        Streams the raw readings of the requested range as CSV, including
+        archived months. Rows are read through a server-side cursor and
+        written as they arrive, so memory stays flat regardless of the range
+        size.
+        """
+        measurement_range = self.get_range()
+        if measurement_range is None:
+            return Response(
+                {"error": "station_id, start and end are required."}, status=400
+            )
+        station_id_str, start_date, end_date = measurement_range
+
+        # Months moved to Parquet by archive_measurements are merged back in
+        # timestamp order.
+        if request.query_params.get("layout") == "wide":
+            columns = self.get_columns()
+            header = WIDE_EXPORT_HEADER + columns
+            rows = wide_rows(
+                station_id_str,
+                with_archived_wide_rows(
+                    station_id_str,
+                    start_date,
+                    end_date,
+                    wide_measurements(self.get_queryset(), columns).iterator(
+                        chunk_size=EXPORT_CHUNK_SIZE
+                    ),
+                    columns,
+                ),
+            )
+        else:
+            header = self.get_projection() or EXPORT_HEADER
+            rows = long_rows(
+                with_archived_rows(
+                    station_id_str,
+                    start_date,
+                    end_date,
+                    self.get_queryset()
+                    .values_list("measurement_type", "value", "recorded_at")
+                    .iterator(chunk_size=EXPORT_CHUNK_SIZE),
+                    self.get_types(),
+                )
+            )
+            if header != EXPORT_HEADER:
+                positions = [EXPORT_HEADER.index(field) for field in header]
+                rows = ([row[i] for i in positions] for row in rows)
+        response = StreamingHttpResponse(
+            stream_csv(header, rows), content_type="text/csv"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="measurements-{station_id_str}.csv"'
+        )
+        return response
+
+
+class DataIngestionView(DecompressRequestMixin, APIView):
     """
     Receives and saves data from IoT devices via POST request.
+    Readings are sent either as a `measurements` list of
+    {"type", "value", "recorded_at"} objects, or column-wise as a
+    `timestamps` list plus a `values` object with one list per measurement
+    type, as JSON or packed binary (see stations.parsers). Bodies may be
+    gzip or zstd compressed (Content-Encoding).
     This endpoint should be protected with an API key (skipped for now for simplicity).
     """
 
     permission_classes = [permissions.AllowAny]  # TODO: Add API Key auth
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, PackedReadingsParser]
 
     def post(self, request):
         data = request.data
         station_id = data.get("station_id")
-        measurements_data = data.get("measurements", [])
+        columnar = "timestamps" in data
+
+        if columnar:
+            try:
+                readings = columnar_readings(data["timestamps"], data.get("values"))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            errors = []
+            has_readings = bool(readings)
+        else:
+            measurements_data = data.get("measurements", [])
+            has_readings = bool(measurements_data)
 
-        if not station_id or not measurements_data:
+        if not station_id or not has_readings:
             return Response(
                 {"error": "station_id and measurements are required"}, status=400
             )
 
-        # Create station if it doesn't exist (or return an error, optional)
-        station, created = Station.objects.get_or_create(
-            station_id=station_id,
-            defaults={
-                "name": data.get("location", f"Station {station_id}"),
-                "location": data.get("location", ""),
+        if settings.INGESTION_MODE == "queue":
+            # Only validate here; process_ingestion_queue writes the readings.
+            if not columnar:
+                readings, errors = validate_readings(measurements_data)
+            if readings:
+                enqueue(station_id, data.get("location", ""), readings)
+            return Response(
+                {
+                    "status": "queued",
+                    "accepted": len(readings),
+                    "rejected": len(errors),
+                    "errors": errors,
+                },
+                status=202,
+            )
+
+        # Create station if it doesn't exist; known stations skip the query.
+        ensure_station(station_id, data.get("location"))
+
+        if columnar:
+            # Already validated column-wise: hand the rows to the COPY writer.
+            accepted = write_readings(station_readings(station_id, readings))
+        else:
+            # Validate the whole payload in one pass, then write it with a single
+            # bulk INSERT instead of one round trip per reading.
+            measurements, errors = build_measurements(station_id, measurements_data)
+            accepted = write_measurements(measurements)
+
+        return Response(
+            {
+                "status": "success",
+                "accepted": accepted,
+                "rejected": len(errors),
+                "errors": errors,
             },
+            status=201,
         )
 
-        for m_data in measurements_data:
-            serializer = MeasurementCreateSerializer(data=m_data)
-            if serializer.is_valid():
-                # Convert Unix timestamp to datetime object
-                unix_timestamp = serializer.validated_data["recorded_at"]
-                dt_object = datetime.fromtimestamp(unix_timestamp, tz=timezone.utc)
-
-                Measurement.objects.create(
-                    station=station,
-                    measurement_type=serializer.validated_data["type"],
-                    value=serializer.validated_data["value"],
-                    recorded_at=dt_object,
-                )
-            else:
-                # Log or handle serializer errors
-                print(serializer.errors)
-        return Response({"status": "success"}, status=201)
+
+class IngestionQueueStatsView(APIView):
+    """
+    Returns the depth of the ingestion queue and the throughput counters of
+    the enqueueing views and the process_ingestion_queue workers.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(queue_stats())
 
 
 class StationDataAvailabilityView(APIView):
     """
-    Returns the date range (oldest and newest) of available data for a specific station.
+    Returns the date range (oldest and newest) of available data for a specific
+    station, and its reading count per measurement type. Served from the
+    MeasurementSummary rows kept by the ingestion paths, with ETag and
+    Last-Modified headers so clients can revalidate with a 304.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, station_id):
-        try:
-            # Get Min and Max dates for the relevant station in a single query
-            date_range = Measurement.objects.filter(
-                station__station_id=station_id
-            ).aggregate(min_date=Min("recorded_at"), max_date=Max("recorded_at"))
-
-            # If there is no data, min_date and max_date will return None.
-            if not date_range["min_date"] or not date_range["max_date"]:
-                return Response(
-                    {"error": "No data available for this station."}, status=404
-                )
-
+        summaries = list(MeasurementSummary.objects.filter(station_id=station_id))
+        if not summaries:
             return Response(
+                {"error": "No data available for this station."}, status=404
+            )
+
+        last_modified = max(s.updated_at for s in summaries)
+        etag = quote_etag(
+            hashlib.md5(
+                "|".join(
+                    f"{s.measurement_type}:{s.first_recorded_at.isoformat()}:"
+                    f"{s.last_recorded_at.isoformat()}:{s.reading_count}"
+                    for s in sorted(summaries, key=lambda s: s.measurement_type)
+                ).encode()
+            ).hexdigest()
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp())
+        )
+        if response is None:
+            response = Response(
                 {
                     "station_id": station_id,
-                    "min_date": date_range["min_date"],
-                    "max_date": date_range["max_date"],
+                    "min_date": min(s.first_recorded_at for s in summaries),
+                    "max_date": max(s.last_recorded_at for s in summaries),
+                    "measurement_counts": {
+                        s.measurement_type: s.reading_count for s in summaries
+                    },
                 }
             )
-        except Station.DoesNotExist:
-            return Response({"error": "Station not found."}, status=404)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+        # Cache, but revalidate on every use.
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+class StationStatsView(APIView):
+    """
+    Returns summary statistics (count, min, max, mean, standard deviation and
+    percentiles) of a station's readings between `start` and `end`, per
+    measurement type. `type` (repeatable or comma separated) restricts the
+    types and `percentiles` overrides the default 5,25,50,75,95.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, station_id):
+        params = request.query_params
+        try:
+            start = parse_timestamp(params["start"])
+            end = parse_timestamp(params["end"])
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "start and end are required ISO timestamps."}, status=400
+            )
+
+        types = [t for value in params.getlist("type") for t in value.split(",") if t]
+        percentiles = None
+        if "percentiles" in params:
+            try:
+                percentiles = [float(p) for p in params["percentiles"].split(",")]
+            except ValueError:
+                percentiles = []
+            if not percentiles or not all(0 <= p <= 100 for p in percentiles):
+                return Response(
+                    {"error": "percentiles must be numbers between 0 and 100."},
+                    status=400,
+                )
+
+        stats = cached_measurement_stats(station_id, start, end, types, percentiles)
+        return Response(
+            {"station_id": station_id, "start": start, "end": end, "stats": stats}
+        )
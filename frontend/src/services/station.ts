@@ -3,6 +3,7 @@ import {
   Station,
   StationPayload,
   Measurement,
+  MeasurementSeries,
   StationDataAvailability,
 } from "../types";
 
@@ -25,18 +26,44 @@ const stationService = {
     stationId: string,
     start: string,
     end: string,
+    types?: string[],
   ): Promise<Measurement[]> => {
     const params = new URLSearchParams({
       station_id: stationId,
       start,
       end,
     });
+    // Filtered in the database, so unselected sensors are never transferred.
+    if (types && types.length > 0) {
+      params.set("types", types.join(","));
+    }
     const { data } = await api.get<Measurement[]>(
       `/measurements/?${params.toString()}`,
     );
     return data;
   },
 
+  getMeasurementSeries: async (
+    stationId: string,
+    start: string,
+    end: string,
+    types?: string[],
+  ): Promise<MeasurementSeries> => {
+    const params = new URLSearchParams({
+      station_id: stationId,
+      start,
+      end,
+      layout: "columnar",
+    });
+    if (types && types.length > 0) {
+      params.set("types", types.join(","));
+    }
+    const { data } = await api.get<MeasurementSeries>(
+      `/measurements/?${params.toString()}`,
+    );
+    return data;
+  },
+
   createStation: async (stationData: StationPayload): Promise<Station> => {
     const { data } = await api.post<Station>("/stations/", stationData);
     return data;
@@ -19,8 +19,13 @@ export interface Measurement {
   recorded_at: string;
 }
 
+// `layout=columnar` response: per measurement type, epoch seconds (`t`) and
+// values (`v`), oldest first.
+export type MeasurementSeries = Record<string, { t: number[]; v: number[] }>;
+
 export interface StationDataAvailability {
   station_id: string;
   min_date: string;
   max_date: string;
+  measurement_counts?: Record<string, number>;
 }
@@ -1,71 +1,248 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 import pandas as pd
 import requests
-import os
+import zstandard
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+# Leituras enviadas por requisição.
+DEFAULT_CHUNK_SIZE = 5000
+# Requisições simultâneas (e conexões mantidas no pool).
+DEFAULT_MAX_WORKERS = 4
+# Tentativas por requisição, com espera exponencial entre elas.
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+# Formato binário compactado aceito por /api/iot-data/, codificado pelo
+# próprio módulo do backend (só depende de numpy).
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+)
+from stations.packing import MEDIA_TYPE as PACKED_CONTENT_TYPE  # noqa: E402
+from stations.packing import pack_readings  # noqa: E402
 
-def convert_and_send_iot_data(csv_path, api_url, default_location="Unknown Location"):
-    df = pd.read_csv(csv_path)
 
-    if "Timestamp" not in df.columns or "DeviceID" not in df.columns:
-        raise ValueError(f"Arquivo {csv_path} não contém 'Timestamp' e 'DeviceID'")
+def normalize_column(col):
+    return col.strip().lower().replace(" ", "_").replace("[", "").replace("]", "")
+
+
+def build_payloads(df, default_location="Unknown Location", chunk_size=None):
+    """
+    Converte o DataFrame largo (uma coluna por sensor) em payloads para
+    /api/iot-data/, com no máximo `chunk_size` leituras cada.
+    A conversão é vetorizada: melt + máscara de NaN, sem iterrows().
+    """
+    sensor_columns = [c for c in df.columns if c not in ("Timestamp", "DeviceID")]
+    df = df.rename(columns={c: normalize_column(c) for c in sensor_columns})
+    sensor_columns = [normalize_column(c) for c in sensor_columns]
+
+    long_df = df.melt(
+        id_vars=["Timestamp", "DeviceID"],
+        value_vars=sensor_columns,
+        var_name="type",
+        value_name="value",
+    )
+    long_df = long_df[long_df["value"].notna()]
+    long_df = long_df.sort_values(["DeviceID", "Timestamp"], kind="stable")
+
+    device_ids = long_df["DeviceID"].to_numpy()
+    station_ids = long_df["DeviceID"].tolist()
+    types = long_df["type"].to_numpy()
+    values = long_df["value"].to_numpy(dtype=np.float64).tolist()
+    timestamps = long_df["Timestamp"].to_numpy(dtype=np.int64).tolist()
+
+    # Limites de cada estação no array ordenado.
+    if len(device_ids):
+        starts = np.flatnonzero(np.r_[True, device_ids[1:] != device_ids[:-1]])
+    else:
+        starts = np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(device_ids)]
 
-    grouped = df.groupby("DeviceID")
     payloads = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        step = chunk_size or (end - start)
+        for chunk_start in range(start, end, step):
+            chunk_end = min(chunk_start + step, end)
+            payloads.append(
+                {
+                    "station_id": station_ids[start],
+                    "location": default_location,
+                    "measurements": [
+                        {"type": t, "value": v, "recorded_at": ts}
+                        for t, v, ts in zip(
+                            types[chunk_start:chunk_end],
+                            values[chunk_start:chunk_end],
+                            timestamps[chunk_start:chunk_end],
+                        )
+                    ],
+                }
+            )
+    return payloads
 
-    for device_id, group in grouped:
-        measurements = []
-        for _, row in group.iterrows():
-            timestamp = row["Timestamp"]
-            for col in group.columns:
-                if col in ["Timestamp", "DeviceID"]:
-                    continue
-                value = row[col]
-                if pd.isna(value):
-                    continue
-                measurements.append(
-                    {
-                        "type": col.strip()
-                        .lower()
-                        .replace(" ", "_")
-                        .replace("[", "")
-                        .replace("]", ""),
-                        "value": float(value),
-                        "recorded_at": timestamp,
-                    }
-                )
 
-        if not measurements:
-            continue
+def build_packed_payloads(df, default_location="Unknown Location", chunk_size=None):
+    """
+    Gera corpos binários por estação direto das colunas do CSV, sem melt:
+    cada linha do CSV já é um timestamp com uma coluna por sensor.
+    `chunk_size` limita o número de linhas (timestamps) por corpo.
+    Retorna tuplas (station_id, corpo, número de leituras).
+    """
+    sensor_columns = [c for c in df.columns if c not in ("Timestamp", "DeviceID")]
+    df = df.sort_values(["DeviceID", "Timestamp"], kind="stable")
 
-        payload = {
-            "station_id": device_id,
-            "location": default_location,
-            "measurements": measurements,
+    payloads = []
+    for _, group in df.groupby("DeviceID", sort=False):
+        # tolist() devolve tipos Python, serializáveis no cabeçalho JSON.
+        device_id = group["DeviceID"].tolist()[0]
+        timestamps = group["Timestamp"].to_numpy(dtype=np.int64)
+        columns = {
+            normalize_column(c): group[c].to_numpy(dtype=np.float64)
+            for c in sensor_columns
         }
+        step = chunk_size or len(group)
+        for start in range(0, len(group), step):
+            end = start + step
+            chunk = {t: v[start:end] for t, v in columns.items()}
+            count = int(sum(np.count_nonzero(~np.isnan(v)) for v in chunk.values()))
+            body = pack_readings(
+                device_id, timestamps[start:end], chunk, default_location
+            )
+            payloads.append((device_id, body, count))
+    return payloads
 
-        payloads.append(payload)
 
-        try:
-            response = requests.post(api_url, json=payload)
-            print(
-                f"[{csv_path}] Station {device_id} => Status {response.status_code}: {response.text}"
-            )
-        except Exception as e:
-            print(
-                f"Erro ao enviar dados do arquivo {csv_path} (estação {device_id}): {e}"
+def create_session(
+    max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF
+):
+    """
+    Sessão com conexões reutilizáveis e novas tentativas automáticas.
+    O POST pode ser repetido com segurança: a API ignora leituras duplicadas.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def compress_body(body, compress):
+    if compress == "gzip":
+        return gzip.compress(body)
+    if compress == "zstd":
+        return zstandard.ZstdCompressor().compress(body)
+    raise ValueError(f"Compressão desconhecida: {compress}")
+
+
+def send_payload(session, api_url, payload, compress=None):
+    if isinstance(payload, bytes):
+        headers = {"Content-Type": PACKED_CONTENT_TYPE}
+        body = payload
+    else:
+        headers = {"Content-Type": "application/json"}
+        body = json.dumps(payload).encode("utf-8")
+    if compress:
+        # A API descompacta o corpo conforme o Content-Encoding.
+        headers["Content-Encoding"] = compress
+        body = compress_body(body, compress)
+    response = session.post(api_url, data=body, headers=headers)
+    return response.status_code, response.text
+
+
+def convert_and_send_iot_data(
+    csv_path,
+    api_url,
+    default_location="Unknown Location",
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_workers=DEFAULT_MAX_WORKERS,
+    session=None,
+    binary=False,
+    compress=None,
+):
+    df = pd.read_csv(csv_path)
+
+    if "Timestamp" not in df.columns or "DeviceID" not in df.columns:
+        raise ValueError(f"Arquivo {csv_path} não contém 'Timestamp' e 'DeviceID'")
+
+    if binary:
+        payloads = build_packed_payloads(df, default_location, chunk_size)
+    else:
+        payloads = [
+            (payload["station_id"], payload, len(payload["measurements"]))
+            for payload in build_payloads(df, default_location, chunk_size)
+        ]
+    session = session or create_session(max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(send_payload, session, api_url, body, compress): (
+                device_id,
+                count,
             )
+            for device_id, body, count in payloads
+        }
+        for future in as_completed(futures):
+            device_id, count = futures[future]
+            try:
+                status_code, text = future.result()
+                print(
+                    f"[{csv_path}] Station {device_id} "
+                    f"({count} leituras) => "
+                    f"Status {status_code}: {text}"
+                )
+            except Exception as e:
+                print(
+                    f"Erro ao enviar dados do arquivo {csv_path} (estação {device_id}): {e}"
+                )
 
-    return payloads
+    return [body for _, body, _ in payloads]
 
 
 if __name__ == "__main__":
-    pasta_dos_csvs = "dados_csv"
-    api_url = "http://localhost:5000/iot-data"
+    parser = argparse.ArgumentParser(description="Envia CSVs de estações para a API.")
+    parser.add_argument("pasta_dos_csvs", nargs="?", default="dados_csv")
+    parser.add_argument("--api-url", default="http://localhost:5000/iot-data")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Envia no formato binário compactado em vez de JSON.",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=["gzip", "zstd"],
+        help="Comprime o corpo das requisições.",
+    )
+    args = parser.parse_args()
 
-    for arquivo in os.listdir(pasta_dos_csvs):
+    session = create_session(args.workers)
+    for arquivo in sorted(os.listdir(args.pasta_dos_csvs)):
         if arquivo.endswith(".csv"):
-            caminho_completo = os.path.join(pasta_dos_csvs, arquivo)
+            caminho_completo = os.path.join(args.pasta_dos_csvs, arquivo)
             try:
-                convert_and_send_iot_data(caminho_completo, api_url)
+                convert_and_send_iot_data(
+                    caminho_completo,
+                    args.api_url,
+                    chunk_size=args.chunk_size,
+                    max_workers=args.workers,
+                    session=session,
+                    binary=args.binary,
+                    compress=args.compress,
+                )
             except Exception as e:
                 print(f"Erro ao processar {arquivo}: {e}")